@@ -2,7 +2,7 @@
 from flask import Flask, request, jsonify
 from flask_cors import CORS
 from predict import HospitalReadmissionPredictor
-import pandas as pd
+from ingest import score_upload
 import os
 import tempfile
 
@@ -23,7 +23,7 @@ def predict_patients():
     """
     Accepts either:
       - JSON payload: {"patients": [ {feature_dict}, ... ]}
-      - File upload: CSV file with patient features
+      - File upload: CSV or Excel (.xlsx) file with patient features
     Returns batch predictions in JSON format.
     """
     # ---- CASE 1: JSON ----
@@ -42,22 +42,12 @@ def predict_patients():
         if file.filename == '':
             return jsonify({"error": "No file selected"}), 400
 
+        # CSV or Excel (xlsx), read and scored in row blocks
         try:
-            df = pd.read_csv(file)
-
-            # Convert Yes/No columns to 1/0
-            yes_no_cols = ['change', 'diabetes_med','A1Ctest','glucose_test']
-            for col in yes_no_cols:
-                if col in df.columns:
-                    df[col] = df[col].map({'Yes': 1, 'No': 0}).fillna(0)
-
-            # Convert DataFrame to list of dicts
-            patients = []
-            for _, row in df.iterrows():
-                patient_data = {feature: row.get(feature, 0.0) for feature in predictor.feature_names}
-                patients.append(patient_data)
+            results = score_upload(predictor, file, sheet=request.form.get('sheet'))
         except Exception as e:
-            return jsonify({"error": f"Failed to read CSV: {str(e)}"}), 400
+            return jsonify({"error": f"Failed to read file: {str(e)}"}), 400
+        return jsonify({"success": True, "predictions": results})
 
     else:
         return jsonify({"error": "No JSON payload or file uploaded"}), 400
@@ -0,0 +1,104 @@
+"""
+Cohort Risk Aggregation
+Canonical risk cut-offs and vectorized summaries over scored probability arrays
+"""
+
+import numpy as np
+
+# The one risk cut-off table (highest first) - same cut-offs as local-ml.ts and the demo scripts:
+# (dashboard band, risk level reported per patient by HospitalReadmissionPredictor, min probability)
+RISK_CUTOFFS = [
+    ('High', 'HIGH RISK', 0.70),
+    ('Medium', 'MEDIUM RISK', 0.40),
+    ('Low', 'LOW RISK', 0.0)
+]
+
+RISK_BANDS = [(band, cutoff) for band, _, cutoff in RISK_CUTOFFS]
+RISK_LEVELS = [(level, cutoff) for _, level, cutoff in RISK_CUTOFFS]
+
+
+def band_codes(probabilities, bands=RISK_BANDS):
+    """
+    Vectorized band lookup
+
+    Returns:
+        np.ndarray: Index into `bands` for every probability (0 = highest band)
+    """
+    cutoffs = np.array([cutoff for _, cutoff in bands[:-1]][::-1])
+    return len(bands) - 1 - np.searchsorted(cutoffs, np.asarray(probabilities, dtype=float), side='right')
+
+
+def risk_label(probability, bands=RISK_BANDS):
+    """Band label for a single probability"""
+    for label, cutoff in bands:
+        if probability >= cutoff:
+            return label
+    return bands[-1][0]
+
+
+def summarize_cohort(probabilities, patient_ids=None, top_k=10, bins=10,
+                     percentiles=(10, 25, 50, 75, 90, 95, 99), bands=RISK_BANDS):
+    """
+    Aggregate a cohort's scores into a compact dashboard summary
+
+    Args:
+        probabilities (array-like): Readmission probability per patient
+        patient_ids (list): Optional ids aligned with probabilities (defaults to 1-based row numbers)
+        top_k (int): Number of highest-risk patients to return
+        bins (int): Histogram bins over [0, 1]
+        percentiles (tuple): Percentiles to report
+
+    Returns:
+        dict: Band counts, histogram, percentiles and top-K patients
+
+    Raises:
+        ValueError: On missing / non-finite / out-of-range probabilities or a negative top_k
+    """
+    if top_k < 0:
+        raise ValueError("top_k must be >= 0")
+    try:
+        p = np.asarray(probabilities, dtype=float).ravel()
+    except (TypeError, ValueError):
+        raise ValueError("probabilities must be a list of numbers")
+    bad = ~np.isfinite(p) | (p < 0) | (p > 1)
+    if bad.any():
+        raise ValueError(f"Probabilities must be finite and within [0, 1]; "
+                         f"{int(bad.sum())} invalid, first at index {int(np.flatnonzero(bad)[0])}")
+    n = len(p)
+    patient_ids = list(range(1, n + 1)) if patient_ids is None else list(patient_ids)
+    if len(patient_ids) != n:
+        raise ValueError("patient_ids must align with probabilities")
+
+    codes = band_codes(p, bands)
+    counts = np.bincount(codes, minlength=len(bands))
+    hist, edges = np.histogram(p, bins=bins, range=(0.0, 1.0))
+
+    # Partial selection: O(n) to find the K largest, sort only those K
+    k = min(top_k, n)
+    top_idx = np.argpartition(-p, k - 1)[:k] if k else np.array([], dtype=int)
+    top_idx = top_idx[np.argsort(-p[top_idx], kind='stable')]
+
+    return {
+        'total_patients': n,
+        'bands': [
+            {'label': label, 'min_probability': cutoff, 'count': int(count)}
+            for (label, cutoff), count in zip(bands, counts)
+        ],
+        'counts': {label: int(count) for (label, _), count in zip(bands, counts)},
+        'mean_probability': round(float(p.mean()), 4) if n else None,
+        'percentiles': {
+            f'p{q}': round(float(v), 4) for q, v in zip(percentiles, np.percentile(p, percentiles))
+        } if n else {},
+        'histogram': {
+            'edges': [round(float(e), 4) for e in edges],
+            'counts': hist.tolist()
+        },
+        'top_patients': [
+            {
+                'patient_id': patient_ids[i],
+                'probability': round(float(p[i]), 4),
+                'risk_level': bands[codes[i]][0]
+            }
+            for i in top_idx
+        ]
+    }
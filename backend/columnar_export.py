@@ -0,0 +1,108 @@
+"""
+Columnar Prediction Export
+Streams scored chunks straight to Parquet or Arrow IPC files, one row group /
+record batch per chunk, with dictionary-encoded risk labels.
+"""
+
+import os
+
+import numpy as np
+
+from cohort import RISK_BANDS, RISK_LEVELS, band_codes
+
+try:
+    import pyarrow as pa
+    import pyarrow.ipc as ipc
+    import pyarrow.parquet as pq
+    PYARROW_AVAILABLE = True
+except ImportError:
+    PYARROW_AVAILABLE = False
+
+FORMATS = {'.parquet': 'parquet', '.arrow': 'arrow', '.feather': 'arrow', '.arrows': 'arrow'}
+
+
+def _dictionary(codes, table):
+    """Dictionary-encoded label column from band codes"""
+    return pa.DictionaryArray.from_arrays(
+        pa.array(codes.astype(np.int8), type=pa.int8()),
+        pa.array([label for label, _ in table], type=pa.string())
+    )
+
+
+class ColumnarPredictionWriter:
+    """
+    Write prediction arrays chunk by chunk
+
+    Usage:
+        with ColumnarPredictionWriter('batch_predictions.parquet', threshold=0.4) as writer:
+            for start, probabilities, default_preds in predictor.iter_score_chunks(df):
+                writer.write_chunk(np.arange(start, start + len(probabilities)) + 1,
+                                   probabilities, default_preds)
+    """
+
+    def __init__(self, sink, fmt=None, threshold=0.4, compression='zstd'):
+        """
+        Args:
+            sink (str | file-like): Output path or writable binary stream
+            fmt (str): 'parquet' or 'arrow' (inferred from the path extension if omitted)
+            threshold (float): Custom threshold for the decision column
+            compression (str): Parquet codec / Arrow IPC buffer compression
+        """
+        if not PYARROW_AVAILABLE:
+            raise ImportError("pyarrow is required for columnar export (pip install pyarrow)")
+
+        if fmt is None:
+            fmt = FORMATS.get(os.path.splitext(sink)[1].lower()) if isinstance(sink, str) else None
+        if fmt not in ('parquet', 'arrow'):
+            raise ValueError("Output format must be 'parquet' or 'arrow'")
+
+        self.sink = sink
+        self.fmt = fmt
+        self.threshold = threshold
+        self.compression = compression
+        self.rows_written = 0
+        self.schema = pa.schema([
+            ('patient_id', pa.int64()),
+            ('prob_readmitted', pa.float32()),
+            ('prediction', pa.int8()),
+            ('default_prediction', pa.int8()),
+            ('risk_band', pa.dictionary(pa.int8(), pa.string())),
+            ('risk_level', pa.dictionary(pa.int8(), pa.string())),
+        ], metadata={'threshold': str(threshold)})
+
+        if fmt == 'parquet':
+            self._writer = pq.ParquetWriter(sink, self.schema, compression=compression)
+        else:
+            options = ipc.IpcWriteOptions(compression=compression)
+            self._writer = ipc.new_file(sink, self.schema, options=options)
+
+    def write_chunk(self, patient_ids, probabilities, default_predictions):
+        """
+        Append one scored chunk (one Parquet row group / Arrow record batch)
+
+        Args:
+            patient_ids (array-like): Integer patient ids
+            probabilities (np.ndarray): Readmission probability per patient
+            default_predictions (np.ndarray): Model's default (0.5) class prediction
+        """
+        probabilities = np.asarray(probabilities, dtype=np.float64)
+        batch = pa.RecordBatch.from_arrays([
+            pa.array(np.asarray(patient_ids, dtype=np.int64)),
+            pa.array(probabilities.astype(np.float32)),
+            pa.array((probabilities >= self.threshold).astype(np.int8)),
+            pa.array(np.asarray(default_predictions).astype(np.int8)),
+            _dictionary(band_codes(probabilities, RISK_BANDS), RISK_BANDS),
+            _dictionary(band_codes(probabilities, RISK_LEVELS), RISK_LEVELS),
+        ], schema=self.schema)
+
+        self._writer.write_batch(batch)
+        self.rows_written += len(probabilities)
+
+    def close(self):
+        self._writer.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
@@ -0,0 +1,291 @@
+"""
+Compact (float32) Inference
+Re-implements the bagged RBF/linear SVC ensemble's predict_proba with float32
+support vectors and inputs, scored in row chunks so the kernel block stays
+bounded. Binary (one-hot / flag) features are held as int8 until scaling.
+
+Opt-in: HospitalReadmissionPredictor(compact=True). Check equivalence against
+the float64 model offline before enabling it:
+
+    python compact_inference.py patients.csv --synthetic 20000
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+COMPACT_DTYPE = np.float32
+CHUNK_ROWS = 2048
+SUPPORTED_KERNELS = ('rbf', 'linear')
+# libsvm clamps pairwise probabilities to [MIN_PROB, 1 - MIN_PROB]
+MIN_PROB = 1e-7
+# libsvm's coupling solver stops once its error drops below this, so rows near the
+# stopping boundary can jump by up to about this much under tiny input changes
+COUPLING_EPS = 0.005 / 2
+
+
+def binary_feature_mask(scaler):
+    """Features whose training mean/variance look Bernoulli (0/1 columns)"""
+    p = np.asarray(scaler.mean_, dtype=float)
+    var = np.asarray(scaler.var_, dtype=float)
+    return (p >= 0) & (p <= 1) & np.isclose(var, p * (1 - p), rtol=0.05, atol=1e-3)
+
+
+def synthetic_training_rows(scaler, n, feature_names, random_state=0):
+    """
+    Raw feature rows drawn from the scaler's training statistics
+
+    Continuous columns are normal with the training mean / std; 0/1 columns are
+    Bernoulli with the training rate, so they stay valid flags.
+    """
+    rng = np.random.default_rng(random_state)
+    X = rng.standard_normal((n, len(feature_names))) * scaler.scale_ + scaler.mean_
+    binary = binary_feature_mask(scaler)
+    X[:, binary] = (rng.random((n, binary.sum())) < scaler.mean_[binary]).astype(float)
+    return pd.DataFrame(X, columns=feature_names)
+
+
+def compact_frame(df):
+    """Downcast a feature block: 0/1 columns to int8, everything else to float32"""
+    columns = {}
+    for col in df.columns:
+        values = df[col].to_numpy()
+        if np.isin(values, (0, 1)).all():
+            columns[col] = values.astype(np.int8)
+        else:
+            columns[col] = values.astype(COMPACT_DTYPE)
+    return pd.DataFrame(columns, index=df.index)
+
+
+def _pairwise_coupling(r01):
+    """
+    Two-class probabilities exactly as libsvm computes them
+
+    sklearn's bundled libsvm runs the iterative pairwise-coupling solver even
+    for two classes (it stops at max error 0.005 / k), so the closed-form
+    Platt output differs from SVC.predict_proba by up to ~1e-3.
+    """
+    r10 = 1.0 - r01
+    Q = np.empty((len(r01), 2, 2))
+    Q[:, 0, 0] = r10 ** 2
+    Q[:, 1, 1] = r01 ** 2
+    Q[:, 0, 1] = Q[:, 1, 0] = -r10 * r01
+
+    p = np.full((len(r01), 2), 0.5)
+    active = np.ones(len(r01), dtype=bool)
+    for _ in range(100):
+        Qp = np.einsum('nij,nj->ni', Q, p)
+        pQp = (p * Qp).sum(axis=1)
+        active &= np.abs(Qp - pQp[:, None]).max(axis=1) >= COUPLING_EPS
+        if not active.any():
+            break
+        for t in range(2):
+            diff = np.where(active, (pQp - Qp[:, t]) / Q[:, t, t], 0.0)
+            p[:, t] += diff
+            pQp = (pQp + diff * (diff * Q[:, t, t] + 2 * Qp[:, t])) / (1 + diff) / (1 + diff)
+            Qp = (Qp + diff[:, None] * Q[:, t, :]) / (1 + diff)[:, None]
+            p /= (1 + diff)[:, None]
+    return p
+
+
+class CompactSVC:
+    """One fitted binary SVC with float32 support vectors and dual coefficients"""
+
+    def __init__(self, estimator, features, dtype=COMPACT_DTYPE):
+        if estimator.kernel not in SUPPORTED_KERNELS:
+            raise ValueError(f"Compact mode supports {SUPPORTED_KERNELS} kernels, got '{estimator.kernel}'")
+        if estimator._probA.size == 0:
+            raise ValueError("Compact mode needs SVCs fitted with probability=True")
+
+        self.kernel = estimator.kernel
+        self.features = np.asarray(features)
+        self.all_features = np.array_equal(self.features, np.arange(estimator.support_vectors_.shape[1]))
+        self.support_vectors = estimator.support_vectors_.astype(dtype)
+        self.sv_sq_norms = (self.support_vectors.astype(float) ** 2).sum(axis=1).astype(dtype)
+        self.dual_coef = estimator._dual_coef_[0].astype(dtype)
+        self.intercept = float(estimator._intercept_[0])
+        self.gamma = dtype(estimator._gamma)
+        self.prob_a = float(estimator._probA[0])
+        self.prob_b = float(estimator._probB[0])
+
+    @property
+    def nbytes(self):
+        return self.support_vectors.nbytes + self.sv_sq_norms.nbytes + self.dual_coef.nbytes
+
+    def decision_function(self, X):
+        """libsvm decision values (positive favours classes_[0]) for a float32 chunk"""
+        Xf = X if self.all_features else X[:, self.features]
+        K = Xf @ self.support_vectors.T
+        if self.kernel == 'rbf':
+            # ||x - sv||^2 = ||x||^2 + ||sv||^2 - 2 x.sv, clipped against float32 cancellation
+            K *= -2
+            K += (Xf * Xf).sum(axis=1)[:, None]
+            K += self.sv_sq_norms[None, :]
+            np.maximum(K, 0, out=K)
+            K *= -self.gamma
+            np.exp(K, out=K)
+        return (K @ self.dual_coef).astype(float) + self.intercept
+
+    def predict_proba(self, X):
+        f_ab = self.decision_function(X) * self.prob_a + self.prob_b
+        r01 = np.clip(1.0 / (1.0 + np.exp(f_ab)), MIN_PROB, 1 - MIN_PROB)
+        return _pairwise_coupling(r01)
+
+
+class CompactBaggedSVM:
+    """
+    Drop-in replacement for the fitted BaggingClassifier (predict_proba / predict /
+    classes_) holding float32 arrays, plus the float32 scaling step
+
+    Args:
+        model (BaggingClassifier): Fitted bagging ensemble of binary SVCs
+        scaler (StandardScaler): Fitted scaler used on the model inputs
+        chunk_rows (int): Rows per kernel block (bounds the rows x support-vectors buffer)
+    """
+
+    def __init__(self, model, scaler, dtype=COMPACT_DTYPE, chunk_rows=CHUNK_ROWS):
+        if not hasattr(model, 'estimators_features_') or len(model.classes_) != 2:
+            raise ValueError("Compact mode expects a fitted binary BaggingClassifier")
+        for estimator in model.estimators_:
+            if len(estimator.classes_) != 2:
+                raise ValueError("Every bagged estimator must have seen both classes")
+
+        self.dtype = dtype
+        self.chunk_rows = chunk_rows
+        self.classes_ = model.classes_
+        self.n_features_in_ = getattr(model, 'n_features_in_', None)
+        self.estimators = [CompactSVC(est, feats, dtype)
+                           for est, feats in zip(model.estimators_, model.estimators_features_)]
+
+        n_features = len(scaler.var_)
+        mean = scaler.mean_ if scaler.mean_ is not None and scaler.with_mean else np.zeros(n_features)
+        scale = scaler.scale_ if scaler.scale_ is not None and scaler.with_std else np.ones(n_features)
+        self.mean = np.asarray(mean, dtype=dtype)
+        self.scale = np.asarray(scale, dtype=dtype)
+
+    @property
+    def nbytes(self):
+        return sum(est.nbytes for est in self.estimators)
+
+    def scale_frame(self, df):
+        """StandardScaler transform straight into a float32 matrix (no float64 copy)"""
+        X = df.to_numpy(dtype=self.dtype, copy=True)
+        X -= self.mean
+        X /= self.scale
+        return X
+
+    def predict_proba(self, X_scaled):
+        X_scaled = np.asarray(X_scaled, dtype=self.dtype)
+        probabilities = np.zeros((len(X_scaled), 2))
+        for start in range(0, len(X_scaled), self.chunk_rows):
+            chunk = X_scaled[start:start + self.chunk_rows]
+            for estimator in self.estimators:
+                probabilities[start:start + len(chunk)] += estimator.predict_proba(chunk)
+        return probabilities / len(self.estimators)
+
+    def predict(self, X_scaled):
+        return self.classes_[np.argmax(self.predict_proba(X_scaled), axis=1)]
+
+
+def model_nbytes(model):
+    """Bytes held by the float64 support vectors and dual coefficients of a bagged SVC"""
+    return sum(est.support_vectors_.nbytes + est._dual_coef_.nbytes for est in model.estimators_)
+
+
+def equivalence_report(model, scaler, df, threshold=0.4, tolerance=1e-4):
+    """
+    Compare compact float32 inference against the float64 model
+
+    Args:
+        model (BaggingClassifier): Fitted float64 ensemble
+        scaler (StandardScaler): Fitted scaler
+        df (DataFrame): Raw feature rows in model column order
+        threshold (float): Decision threshold to check agreement at
+        tolerance (float): Acceptable p99.9 absolute probability difference (the max is
+            bounded by COUPLING_EPS, see _pairwise_coupling)
+
+    Returns:
+        dict: Probability error, decision / risk-level agreement, memory and timing
+    """
+    from cohort import RISK_BANDS, band_codes
+
+    compact = CompactBaggedSVM(model, scaler)
+
+    started = time.perf_counter()
+    X64 = scaler.transform(df)
+    exact = model.predict_proba(X64)[:, 1]
+    exact_seconds = time.perf_counter() - started
+
+    frame = compact_frame(df)
+    started = time.perf_counter()
+    X32 = compact.scale_frame(frame)
+    approx = compact.predict_proba(X32)[:, 1]
+    compact_seconds = time.perf_counter() - started
+
+    abs_diff = np.abs(approx - exact)
+    report = {
+        'rows': int(len(df)),
+        'threshold': threshold,
+        'tolerance': tolerance,
+        'max_abs_diff': float(abs_diff.max()),
+        'p999_abs_diff': float(np.quantile(abs_diff, 0.999)),
+        'mean_abs_diff': float(abs_diff.mean()),
+        'rows_over_tolerance': int((abs_diff > tolerance).sum()),
+        'decision_agreement': round(float(((approx >= threshold) == (exact >= threshold)).mean()), 6),
+        'default_decision_agreement': round(float(((approx >= 0.5) == (exact >= 0.5)).mean()), 6),
+        'risk_band_agreement': round(float((band_codes(approx, RISK_BANDS) == band_codes(exact, RISK_BANDS)).mean()), 6),
+        'memory_bytes': {
+            'model_float64': int(model_nbytes(model)),
+            'model_compact': int(compact.nbytes),
+            'input_float64': int(df.to_numpy(dtype=float).nbytes),
+            'input_compact': int(frame.memory_usage(index=False).sum()),
+            'scaled_float64': int(X64.nbytes),
+            'scaled_compact': int(X32.nbytes)
+        },
+        'rows_per_second': {
+            'float64': round(len(df) / exact_seconds, 1),
+            'compact': round(len(df) / compact_seconds, 1)
+        }
+    }
+    report['passed'] = (report['p999_abs_diff'] <= tolerance and report['max_abs_diff'] <= COUPLING_EPS
+                        and report['decision_agreement'] == 1.0 and report['default_decision_agreement'] == 1.0)
+    return report
+
+
+if __name__ == "__main__":
+    sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+    from predict import HospitalReadmissionPredictor
+
+    parser = argparse.ArgumentParser(description="Check compact float32 inference against the float64 model")
+    parser.add_argument('csv_files', nargs='*', help="CSV files with the 44 model features")
+    parser.add_argument('--synthetic', type=int, default=0,
+                        help="Extra rows drawn from the scaler's training distribution")
+    parser.add_argument('--threshold', type=float, default=0.4)
+    parser.add_argument('--tolerance', type=float, default=1e-4)
+    parser.add_argument('--out', default=os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                                      'compact_inference_report.json'))
+    args = parser.parse_args()
+
+    predictor = HospitalReadmissionPredictor(surrogate_path='')
+
+    blocks = [pd.read_csv(path)[predictor.feature_names] for path in args.csv_files]
+    if args.synthetic:
+        blocks.append(synthetic_training_rows(predictor.scaler, args.synthetic, predictor.feature_names))
+    if not blocks:
+        parser.error("Provide at least one CSV file or --synthetic N")
+
+    df = pd.concat(blocks, ignore_index=True).astype(float)
+    print(f"📊 Comparing compact vs float64 inference on {len(df)} rows...")
+    report = equivalence_report(predictor.model, predictor.scaler, df, args.threshold, args.tolerance)
+
+    with open(args.out, 'w') as f:
+        json.dump(report, f, indent=2)
+    print(json.dumps(report, indent=2))
+    print(f"{'✅' if report['passed'] else '❌'} Equivalence check {'passed' if report['passed'] else 'failed'} "
+          f"(report: '{args.out}')")
+    sys.exit(0 if report['passed'] else 1)
@@ -0,0 +1,422 @@
+"""
+Sharded Batch Scoring Coordinator
+Splits a large CSV / xlsx back-fill into row shards and scores them on several
+stable_app.py workers over HTTP (gzip-compressed multipart uploads to /predict).
+Workers pull shards from a shared queue, failed shards are retried (on any
+healthy worker) and results are merged back in input order.
+
+Usage (three local worker processes as stand-ins for nodes):
+    python coordinator.py backfill.csv --spawn 3 --out backfill_predictions.parquet
+
+Usage (existing workers):
+    python coordinator.py backfill.csv --workers http://10.0.0.5:5001 http://10.0.0.6:5001
+
+Retries and worker state: shards are sent without an Idempotency-Key, so each
+worker keys its idempotency cache on the shard content. A shard retried on the
+worker that already finished it (e.g. the response timed out) is replayed from
+that worker's cache; a shard retried on another worker is scored again there,
+and its predictions / high-risk rows are recorded by both workers. Spawned
+workers each get their own SQLite files (see spawn_local_workers) so they do
+not contend for one database, the same as workers on separate nodes.
+"""
+
+import argparse
+import gzip
+import json
+import os
+import queue
+import subprocess
+import sys
+import threading
+import time
+import urllib.error
+import urllib.request
+import uuid
+from collections import deque
+
+import numpy as np
+import pandas as pd
+
+from columnar_export import FORMATS, PYARROW_AVAILABLE, ColumnarPredictionWriter
+from ingest import iter_upload_blocks
+
+DEFAULT_SHARD_SIZE = 5000
+# Consecutive failures before a worker is taken out of rotation
+MAX_WORKER_FAILURES = 3
+
+
+def encode_shard(block, threshold, filename):
+    """Gzip-compressed multipart/form-data body carrying one shard as CSV"""
+    boundary = uuid.uuid4().hex
+    body = b''.join([
+        f'--{boundary}\r\nContent-Disposition: form-data; name="threshold"\r\n\r\n{threshold}\r\n'.encode(),
+        f'--{boundary}\r\nContent-Disposition: form-data; name="block_size"\r\n\r\n{len(block)}\r\n'.encode(),
+        f'--{boundary}\r\nContent-Disposition: form-data; name="file"; filename="{filename}"\r\n'
+        f'Content-Type: text/csv\r\n\r\n'.encode(),
+        block.to_csv(index=False).encode(),
+        f'\r\n--{boundary}--\r\n'.encode()
+    ])
+    return gzip.compress(body, compresslevel=5), f'multipart/form-data; boundary={boundary}'
+
+
+def post_shard(worker_url, body, content_type, timeout):
+    """Send one encoded shard to a worker's /predict and return its predictions"""
+    req = urllib.request.Request(
+        worker_url.rstrip('/') + '/predict', data=body, method='POST',
+        headers={'Content-Type': content_type, 'Content-Encoding': 'gzip', 'Accept-Encoding': 'gzip'}
+    )
+    with urllib.request.urlopen(req, timeout=timeout) as response:
+        payload = response.read()
+        if response.headers.get('Content-Encoding') == 'gzip':
+            payload = gzip.decompress(payload)
+    data = json.loads(payload)
+    if not data.get('success'):
+        raise RuntimeError(data.get('error') or data.get('message') or 'worker reported failure')
+    return data['predictions']
+
+
+class ResultWriter:
+    """Ordered output: Parquet / Arrow via ColumnarPredictionWriter, otherwise CSV rows"""
+
+    def __init__(self, path, threshold):
+        self.path = path
+        self.rows_written = 0
+        fmt = FORMATS.get(os.path.splitext(path)[1].lower())
+        if fmt and not PYARROW_AVAILABLE:
+            print("⚠️ pyarrow not installed - falling back to CSV output")
+            self.path = os.path.splitext(path)[0] + '.csv'
+            fmt = None
+        self._columnar = ColumnarPredictionWriter(self.path, fmt=fmt, threshold=threshold) if fmt else None
+
+    def write(self, start, predictions):
+        patient_ids = np.arange(start, start + len(predictions)) + 1
+        if self._columnar is not None:
+            self._columnar.write_chunk(
+                patient_ids,
+                np.array([p['probabilities']['readmitted'] for p in predictions]),
+                np.array([p['predictions']['default_threshold_0.5']['prediction'] for p in predictions])
+            )
+        else:
+            rows = []
+            for patient_id, result in zip(patient_ids, predictions):
+                row = {'patient_id': int(patient_id)}
+                row.update(result['probabilities'])
+                row.update({k: v['prediction'] for k, v in result['predictions'].items()})
+                row.update(result['risk_assessment'])
+                rows.append(row)
+            pd.DataFrame(rows).to_csv(self.path, mode='w' if self.rows_written == 0 else 'a',
+                                      header=self.rows_written == 0, index=False)
+        self.rows_written += len(predictions)
+
+    def close(self):
+        if self._columnar is not None:
+            self._columnar.close()
+
+
+class ShardCoordinator:
+    """
+    Fan shards out to scoring workers and merge results in order
+
+    Args:
+        workers (list): Worker base URLs (stable_app.py instances)
+        threshold (float): Custom threshold sent with every shard
+        shard_size (int): Rows per shard
+        max_attempts (int): Tries per shard before the run is aborted
+        timeout (float): Per-request timeout in seconds
+        max_pending (int): Shards read but not yet merged (bounds coordinator memory)
+    """
+
+    def __init__(self, workers, threshold=0.4, shard_size=DEFAULT_SHARD_SIZE, max_attempts=3,
+                 timeout=300, max_pending=None):
+        if not workers:
+            raise ValueError("At least one worker URL is required")
+        self.workers = list(workers)
+        self.threshold = threshold
+        self.shard_size = shard_size
+        self.max_attempts = max_attempts
+        self.timeout = timeout
+        self.max_pending = max_pending or 4 * len(self.workers)
+
+    def run(self, input_path, output_path, sheet=None):
+        """
+        Score input_path across the workers, writing ordered results to output_path
+
+        Returns:
+            dict: Throughput, retries and per-worker shard / row / busy-time stats with skew
+        """
+        shards = queue.Queue()
+        retries = deque()
+        completed = {}
+        cond = threading.Condition()
+        pending = threading.Semaphore(self.max_pending)
+        state = {'produced': 0, 'producer_done': False, 'error': None, 'retries': 0}
+        stats = {url: {'shards': 0, 'rows': 0, 'failures': 0, 'busy_seconds': 0.0, 'healthy': True}
+                 for url in self.workers}
+
+        def abort(message):
+            with cond:
+                if state['error'] is None:
+                    state['error'] = message
+                cond.notify_all()
+
+        def produce():
+            try:
+                start = 0
+                for index, block in enumerate(iter_upload_blocks(input_path, self.shard_size, sheet)):
+                    while not pending.acquire(timeout=0.5):
+                        if state['error']:
+                            return
+                    body, content_type = encode_shard(block, self.threshold, f'shard-{index:05d}.csv')
+                    with cond:
+                        shards.put({'index': index, 'start': start, 'rows': len(block), 'attempts': 0,
+                                    'body': body, 'content_type': content_type})
+                        state['produced'] = index + 1
+                        cond.notify_all()
+                    start += len(block)
+            except Exception as e:
+                abort(f"Failed to read '{input_path}': {e}")
+            finally:
+                with cond:
+                    state['producer_done'] = True
+                    cond.notify_all()
+
+        def next_shard():
+            # Taking a shard and counting it in flight happen under one lock, so idle
+            # workers keep waiting while a shard that might still fail is outstanding
+            with cond:
+                while not state['error']:
+                    shard = retries.popleft() if retries else None
+                    if shard is None:
+                        try:
+                            shard = shards.get_nowait()
+                        except queue.Empty:
+                            pass
+                    if shard is not None:
+                        in_flight[0] += 1
+                        return shard
+                    if state['producer_done'] and in_flight[0] == 0:
+                        return None
+                    cond.wait(0.2)
+            return None
+
+        def work(url):
+            consecutive_failures = 0
+            while True:
+                shard = next_shard()
+                if shard is None:
+                    return
+                shard['attempts'] += 1
+                started = time.perf_counter()
+                predictions, error = None, None
+                try:
+                    predictions = post_shard(url, shard['body'], shard['content_type'], self.timeout)
+                    if len(predictions) != shard['rows']:
+                        raise RuntimeError(f"expected {shard['rows']} predictions, got {len(predictions)}")
+                    unscoreable = [p for p in predictions if 'error' in p]
+                    if unscoreable:
+                        # Bad input rows fail the same way on every worker, so stop instead of retrying
+                        first = unscoreable[0]
+                        abort(f"Shard {shard['index']}: {len(unscoreable)} rows could not be scored "
+                              f"(input row {shard['start'] + first['patient_id']}: {first['error']})")
+                except Exception as e:
+                    # Anything a dying worker can produce (IncompleteRead, bad JSON, ...) fails the shard
+                    predictions, error = None, e
+                finally:
+                    # The shard always leaves flight here, so waiters cannot hang on a dead thread
+                    with cond:
+                        in_flight[0] -= 1
+                        stats[url]['busy_seconds'] += time.perf_counter() - started
+                        if predictions is not None:
+                            stats[url]['shards'] += 1
+                            stats[url]['rows'] += len(predictions)
+                            completed[shard['index']] = (shard['start'], predictions)
+                        else:
+                            error = error or 'worker thread interrupted'
+                            consecutive_failures += 1
+                            stats[url]['failures'] += 1
+                            if shard['attempts'] >= self.max_attempts:
+                                state['error'] = state['error'] or \
+                                    f"Shard {shard['index']} failed {shard['attempts']} times: {error}"
+                            else:
+                                state['retries'] += 1
+                                retries.append(shard)
+                            if consecutive_failures >= MAX_WORKER_FAILURES:
+                                stats[url]['healthy'] = False
+                                if not any(s['healthy'] for s in stats.values()):
+                                    state['error'] = state['error'] or "All workers failed"
+                        cond.notify_all()
+
+                if predictions is not None:
+                    consecutive_failures = 0
+                    continue
+                print(f"⚠️ Shard {shard['index']} failed on {url} (attempt {shard['attempts']}): {error}")
+                if not stats[url]['healthy']:
+                    print(f"❌ Worker {url} taken out of rotation")
+                    return
+                time.sleep(min(2 ** consecutive_failures * 0.25, 5))
+
+        in_flight, merged = [0], [0]
+        started = time.perf_counter()
+        producer = threading.Thread(target=produce, name='shard-reader', daemon=True)
+        threads = [threading.Thread(target=work, args=(url,), name=f'shard-worker-{i}', daemon=True)
+                   for i, url in enumerate(self.workers)]
+        producer.start()
+        for thread in threads:
+            thread.start()
+
+        # Merge in input order as contiguous shards complete
+        writer = ResultWriter(output_path, self.threshold)
+        try:
+            while True:
+                with cond:
+                    while merged[0] not in completed and not state['error'] and \
+                            not (state['producer_done'] and merged[0] >= state['produced']):
+                        cond.wait(0.5)
+                    if state['error']:
+                        raise RuntimeError(state['error'])
+                    if merged[0] not in completed:
+                        break
+                    start, predictions = completed.pop(merged[0])
+                writer.write(start, predictions)
+                merged[0] += 1
+                pending.release()
+                print(f"✅ Merged shard {merged[0]} ({writer.rows_written} rows so far)")
+        finally:
+            writer.close()
+            for thread in threads:
+                thread.join(timeout=1)
+
+        elapsed = time.perf_counter() - started
+        return self._report(writer, elapsed, state, stats)
+
+    def _report(self, writer, elapsed, state, stats):
+        # Skew over workers still in rotation (dropped workers are reported separately)
+        healthy = [s for s in stats.values() if s['healthy']] or list(stats.values())
+        rows = np.array([s['rows'] for s in healthy], dtype=float)
+        busy = np.array([s['busy_seconds'] for s in healthy], dtype=float)
+        return {
+            'output': writer.path,
+            'rows': writer.rows_written,
+            'shards': state['produced'],
+            'retries': state['retries'],
+            'elapsed_seconds': round(elapsed, 3),
+            'rows_per_second': round(writer.rows_written / elapsed, 1) if elapsed > 0 else None,
+            'workers': {
+                url: {**s, 'busy_seconds': round(s['busy_seconds'], 3),
+                      'rows_per_second': round(s['rows'] / s['busy_seconds'], 1) if s['busy_seconds'] else None}
+                for url, s in stats.items()
+            },
+            # max / mean: 1.0 means perfectly balanced
+            'skew': {
+                'rows': round(float(rows.max() / rows.mean()), 3) if rows.mean() else None,
+                'busy_seconds': round(float(busy.max() / busy.mean()), 3) if busy.mean() else None
+            }
+        }
+
+
+def worker_state_env(port, state_dir):
+    """Per-worker SQLite paths (idempotency cache, prediction store, re-score state, high-risk sink)"""
+    def path(name):
+        return os.path.join(state_dir, f'{name}_{port}.sqlite3')
+
+    env = {
+        'MEDENGINE_IDEMPOTENCY_DB': path('idempotency'),
+        'MEDENGINE_PREDICTION_STORE': path('predictions'),
+        'MEDENGINE_RESCORE_DB': path('rescore_state')
+    }
+    # A configured sink (e.g. Firestore) is shared on purpose; only the local default is split
+    if not os.environ.get('MEDENGINE_HIGH_RISK_SINK'):
+        env['MEDENGINE_HIGH_RISK_SINK'] = 'sqlite:' + path('high_risk_patients')
+    return env
+
+
+def spawn_local_workers(count, base_port=5101, startup_timeout=120, state_dir=None):
+    """
+    Start stable_app.py worker processes on consecutive localhost ports
+
+    Args:
+        state_dir (str): Directory for each worker's SQLite files (defaults to the backend directory)
+
+    Returns:
+        tuple: (worker URLs, Popen handles)
+    """
+    backend_dir = os.path.dirname(os.path.abspath(__file__))
+    app_path = os.path.join(backend_dir, 'stable_app.py')
+    state_dir = state_dir or backend_dir
+    os.makedirs(state_dir, exist_ok=True)
+    processes, urls = [], []
+    for i in range(count):
+        port = base_port + i
+        env = dict(os.environ, MEDENGINE_PORT=str(port), MEDENGINE_HOST='127.0.0.1',
+                   **worker_state_env(port, state_dir))
+        processes.append(subprocess.Popen([sys.executable, app_path], env=env,
+                                          stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL))
+        urls.append(f'http://127.0.0.1:{port}')
+
+    deadline = time.time() + startup_timeout
+    for url, process in zip(urls, processes):
+        while True:
+            if process.poll() is not None:
+                stop_local_workers(processes)
+                raise RuntimeError(f"Worker {url} exited during startup (code {process.returncode})")
+            try:
+                with urllib.request.urlopen(url + '/health', timeout=2) as response:
+                    if json.loads(response.read()).get('predictor_loaded'):
+                        break
+            except (urllib.error.URLError, OSError, ValueError):
+                pass
+            if time.time() > deadline:
+                stop_local_workers(processes)
+                raise RuntimeError(f"Worker {url} did not become healthy within {startup_timeout}s")
+            time.sleep(0.5)
+        print(f"✅ Worker ready at {url}")
+    return urls, processes
+
+
+def stop_local_workers(processes):
+    for process in processes:
+        process.terminate()
+    for process in processes:
+        try:
+            process.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            process.kill()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Score a large file across several stable_app.py workers")
+    parser.add_argument('input', help="CSV or .xlsx file with patient features")
+    parser.add_argument('--workers', nargs='*', default=[], help="Worker base URLs")
+    parser.add_argument('--spawn', type=int, default=0, help="Start N local workers on consecutive ports")
+    parser.add_argument('--base-port', type=int, default=5101)
+    parser.add_argument('--state-dir', default=None, help="Directory for spawned workers' SQLite files")
+    parser.add_argument('--out', default='sharded_predictions.parquet',
+                        help=".parquet / .arrow for columnar output, otherwise CSV")
+    parser.add_argument('--shard-size', type=int, default=DEFAULT_SHARD_SIZE)
+    parser.add_argument('--threshold', type=float, default=0.4)
+    parser.add_argument('--max-attempts', type=int, default=3)
+    parser.add_argument('--timeout', type=float, default=300)
+    parser.add_argument('--sheet', default=None, help="Excel sheet name (xlsx only)")
+    args = parser.parse_args()
+
+    processes = []
+    workers = list(args.workers)
+    if args.spawn:
+        spawned, processes = spawn_local_workers(args.spawn, args.base_port, state_dir=args.state_dir)
+        workers += spawned
+    if not workers:
+        parser.error("Provide --workers URLs or --spawn N")
+
+    try:
+        print(f"🚀 Scoring '{args.input}' on {len(workers)} workers (shards of {args.shard_size} rows)")
+        coordinator = ShardCoordinator(workers, threshold=args.threshold, shard_size=args.shard_size,
+                                       max_attempts=args.max_attempts, timeout=args.timeout)
+        report = coordinator.run(args.input, args.out, sheet=args.sheet)
+        print(json.dumps(report, indent=2))
+        print(f"✅ {report['rows']} predictions written to '{report['output']}' "
+              f"({report['rows_per_second']} rows/s)")
+    except Exception as e:
+        print(f"❌ Sharded scoring failed: {e}")
+        sys.exit(1)
+    finally:
+        stop_local_workers(processes)
@@ -33,4 +33,8 @@ scaler.fit(X_train)
 
 # Save it
 joblib.dump(scaler, 'scaler.pkl')
-print("✅ Scaler saved as scaler.pkl")
\ No newline at end of file
+print("✅ Scaler saved as scaler.pkl")
+
+# Training sample the drift monitor takes its PSI reference buckets from
+X_train.sample(min(len(X_train), 20000), random_state=0).to_csv('drift_reference.csv', index=False)
+print("✅ Drift reference saved as drift_reference.csv")
\ No newline at end of file
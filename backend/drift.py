@@ -0,0 +1,257 @@
+"""
+Streaming Feature-Drift Monitor
+Compares live prediction traffic against the training statistics stored in the
+fitted StandardScaler (mean_ / var_), using constant memory per feature.
+
+PSI needs the training distribution, not just its moments. With a reference
+sample of training rows, bucket edges and expected proportions come from its
+quantiles. Without one, continuous features are compared against a normal
+curve, and low-cardinality features (encoded ages, bins, logs of small counts)
+are only checked for mean shift and range: a few discrete values can never
+fill normal z-buckets, so their PSI would be a permanent false alarm.
+"""
+
+import math
+import threading
+from collections import deque
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+# PSI bucket edges in training z-score units (continuous features)
+Z_EDGES = np.array([-2.0, -1.0, -0.5, 0.0, 0.5, 1.0, 2.0])
+N_BUCKETS = len(Z_EDGES) + 1
+# Without a reference sample, features with at most this many distinct live values are
+# treated as categorical (no PSI)
+MAX_CATEGORIES = 20
+EPS = 1e-6
+
+
+def _normal_cdf(z):
+    return 0.5 * (1.0 + math.erf(z / math.sqrt(2.0)))
+
+
+def _psi(actual_counts, expected_props):
+    """Population stability index between observed bucket counts and expected proportions"""
+    total = actual_counts.sum(axis=-1, keepdims=True)
+    actual = np.where(total > 0, actual_counts / np.maximum(total, 1), 0.0) + EPS
+    expected = expected_props + EPS
+    return ((actual - expected) * np.log(actual / expected)).sum(axis=-1)
+
+
+class FeatureDriftMonitor:
+    """
+    Online drift detection over scored batches
+
+    Per feature it keeps running count / mean / M2 (Chan's parallel update),
+    PSI bucket counts for continuous features and 0/1 frequency counters for
+    one-hot / binary features, plus out-of-range and missing-value counters.
+
+    Args:
+        reference (DataFrame): Optional sample of raw training rows; PSI buckets are then
+            training quantiles instead of a normal approximation
+    """
+
+    def __init__(self, scaler, feature_names, psi_threshold=0.2, mean_shift_threshold=0.5,
+                 range_sigma=6.0, min_samples=200, max_events=200, reference=None):
+        self.feature_names = list(feature_names)
+        self.train_mean = np.asarray(scaler.mean_, dtype=float)
+        self.train_std = np.sqrt(np.asarray(scaler.var_, dtype=float))
+        self.train_std[self.train_std == 0] = 1.0
+
+        # Binary feature: training mean in [0, 1] with Bernoulli variance p(1-p)
+        p = self.train_mean
+        self.is_binary = (p >= 0) & (p <= 1) & np.isclose(self.train_std ** 2, p * (1 - p), rtol=0.05, atol=1e-3)
+
+        self.psi_threshold = psi_threshold
+        self.mean_shift_threshold = mean_shift_threshold
+        self.range_sigma = range_sigma
+        self.min_samples = min_samples
+
+        # Per-feature bucket edges in raw units: a value falls in bucket = number of edges below it
+        cdf = np.array([0.0] + [_normal_cdf(z) for z in Z_EDGES] + [1.0])
+        self.edges = self.train_mean[:, None] + Z_EDGES[None, :] * self.train_std[:, None]
+        self.expected = np.where(
+            self.is_binary[:, None],
+            np.pad(np.stack([1 - p, p], axis=1), ((0, 0), (0, N_BUCKETS - 2))),
+            np.diff(cdf)[None, :]
+        )
+        self.has_reference = np.zeros(len(self.feature_names), dtype=bool)
+        if reference is not None:
+            self._use_reference(reference)
+
+        self._lock = threading.Lock()
+        self.events = deque(maxlen=max_events)
+        self.reset()
+
+    def _use_reference(self, reference):
+        """Training-quantile bucket edges and expected proportions for non-binary features"""
+        quantiles = np.arange(1, N_BUCKETS) / N_BUCKETS
+        for f, name in enumerate(self.feature_names):
+            if self.is_binary[f] or name not in reference:
+                continue
+            values = pd.to_numeric(reference[name], errors='coerce').to_numpy(dtype=float)
+            values = values[np.isfinite(values)]
+            if len(values) == 0:
+                continue
+            # Discrete features collapse onto fewer distinct edges; unused slots never match
+            edges = np.unique(np.quantile(values, quantiles))
+            edges = np.pad(edges, (0, N_BUCKETS - 1 - len(edges)), constant_values=np.inf)
+            counts = np.bincount((values[:, None] > edges[None, :]).sum(axis=1), minlength=N_BUCKETS)
+            self.edges[f] = edges
+            self.expected[f] = counts / counts.sum()
+            self.has_reference[f] = True
+
+    def reset(self):
+        """Clear live statistics (training reference is kept)"""
+        n_features, n_buckets = len(self.feature_names), N_BUCKETS
+        with self._lock:
+            self.count = np.zeros(n_features)
+            self.mean = np.zeros(n_features)
+            self.m2 = np.zeros(n_features)
+            self.buckets = np.zeros((n_features, n_buckets), dtype=np.int64)
+            self.out_of_range = np.zeros(n_features, dtype=np.int64)
+            self.missing = np.zeros(n_features, dtype=np.int64)
+            # Distinct live values per feature until there are more than MAX_CATEGORIES (then None)
+            self.distinct = [set() if not (b or r) else None
+                             for b, r in zip(self.is_binary, self.has_reference)]
+            self.rows_seen = 0
+            self.zero_rows = 0
+            self.batches = 0
+            self.drifting = set()
+            self.events.clear()
+
+    def update(self, patients):
+        """
+        Fold one batch into the running statistics
+
+        Args:
+            patients (list | DataFrame): Raw (unscaled) patient rows as sent to the predictor
+        """
+        df = patients if isinstance(patients, pd.DataFrame) else pd.DataFrame(list(patients))
+        X = df.reindex(columns=self.feature_names).apply(pd.to_numeric, errors='coerce').to_numpy(dtype=float)
+        if len(X) == 0:
+            return
+
+        observed = ~np.isnan(X)
+        z = (X - self.train_mean) / self.train_std
+
+        # Batch moments (NaN = missing / unparseable value)
+        n_b = observed.sum(axis=0).astype(float)
+        mean_b = np.where(n_b > 0, np.nansum(X, axis=0) / np.maximum(n_b, 1), 0.0)
+        m2_b = np.nansum((X - mean_b) ** 2, axis=0)
+
+        # Buckets: binary features use {0, 1} counters, continuous ones the per-feature edges
+        above = (np.nan_to_num(X)[:, :, None] > self.edges[None, :, :]).sum(axis=2)
+        bucket = np.where(self.is_binary, (X >= 0.5).astype(int), above)
+        flat = (bucket + np.arange(len(self.feature_names)) * N_BUCKETS)[observed]
+        bucket_counts = np.bincount(flat, minlength=len(self.feature_names) * N_BUCKETS).reshape(-1, N_BUCKETS)
+
+        binary_bad = self.is_binary & ~np.isin(X, (0.0, 1.0)) & observed
+        out_of_range = (binary_bad | (~self.is_binary & (np.abs(z) > self.range_sigma))).sum(axis=0)
+        zero_rows = int((((X == 0) | ~observed).all(axis=1) & observed.any(axis=1)).sum())
+
+        with self._lock:
+            # Chan et al. parallel combination of (count, mean, M2)
+            n_a = self.count
+            n = n_a + n_b
+            delta = mean_b - self.mean
+            self.mean = np.where(n > 0, self.mean + delta * n_b / np.maximum(n, 1), 0.0)
+            self.m2 = self.m2 + m2_b + delta ** 2 * n_a * n_b / np.maximum(n, 1)
+            self.count = n
+
+            self.buckets += bucket_counts
+            for f, seen in enumerate(self.distinct):
+                if seen is not None:
+                    seen.update(np.unique(X[observed[:, f], f]).tolist())
+                    if len(seen) > MAX_CATEGORIES:
+                        self.distinct[f] = None
+            self.out_of_range += out_of_range
+            self.missing += (~observed).sum(axis=0)
+            self.rows_seen += len(X)
+            self.zero_rows += zero_rows
+            self.batches += 1
+
+            if zero_rows > len(X) / 2:
+                self._event('zero_filled_batch', None, f"{zero_rows}/{len(X)} rows are all zeros")
+            for f in np.flatnonzero(out_of_range):
+                self._event('out_of_range', self.feature_names[f],
+                            f"{int(out_of_range[f])} values outside the training range")
+            self._check_drift()
+
+    def _event(self, kind, feature, detail):
+        event = {'time': datetime.now().isoformat(timespec='seconds'),
+                 'type': kind, 'feature': feature, 'detail': detail}
+        self.events.append(event)
+        print(f"⚠️ Drift monitor: {kind}{f' [{feature}]' if feature else ''} - {detail}")
+
+    def _categorical(self):
+        """Low-cardinality features without a reference sample (no PSI for these)"""
+        return np.array([seen is not None for seen in self.distinct])
+
+    def _feature_stats(self):
+        std = np.sqrt(self.m2 / np.maximum(self.count - 1, 1))
+        shift = (self.mean - self.train_mean) / self.train_std
+        psi = np.where(self._categorical(), np.nan, _psi(self.buckets, self.expected))
+        return std, shift, psi
+
+    def _feature_type(self, f, categorical):
+        if self.is_binary[f]:
+            return 'binary'
+        return 'categorical' if categorical[f] else 'continuous'
+
+    def _check_drift(self):
+        """Emit an event when a feature starts or stops drifting"""
+        std, shift, psi = self._feature_stats()
+        enough = self.count >= self.min_samples
+        drifting = enough & ((np.nan_to_num(psi) > self.psi_threshold) | (np.abs(shift) > self.mean_shift_threshold))
+
+        for f in np.flatnonzero(drifting):
+            name = self.feature_names[f]
+            if name not in self.drifting:
+                self.drifting.add(name)
+                psi_text = f"psi={psi[f]:.3f}" if not np.isnan(psi[f]) else "psi=n/a"
+                self._event('drift', name, f"{psi_text}, mean shift={shift[f]:+.2f} sd")
+        for name in list(self.drifting):
+            if not drifting[self.feature_names.index(name)]:
+                self.drifting.discard(name)
+                self._event('recovered', name, "back within thresholds")
+
+    def status(self):
+        """Snapshot of drift signals for the /drift endpoint"""
+        with self._lock:
+            std, shift, psi = self._feature_stats()
+            categorical = self._categorical()
+            features = [
+                {
+                    'feature': name,
+                    'type': self._feature_type(f, categorical),
+                    'reference': 'training sample' if self.has_reference[f] else 'scaler',
+                    'count': int(self.count[f]),
+                    'live_mean': round(float(self.mean[f]), 4),
+                    'live_std': round(float(std[f]), 4),
+                    'train_mean': round(float(self.train_mean[f]), 4),
+                    'train_std': round(float(self.train_std[f]), 4),
+                    'mean_shift_sd': round(float(shift[f]), 4),
+                    'psi': round(float(psi[f]), 4) if not np.isnan(psi[f]) else None,
+                    'out_of_range': int(self.out_of_range[f]),
+                    'missing': int(self.missing[f]),
+                    'drifting': name in self.drifting
+                }
+                for f, name in enumerate(self.feature_names)
+            ]
+            return {
+                'rows_seen': self.rows_seen,
+                'batches': self.batches,
+                'zero_row_fraction': round(self.zero_rows / self.rows_seen, 4) if self.rows_seen else 0.0,
+                'drifting_features': sorted(self.drifting),
+                'thresholds': {
+                    'psi': self.psi_threshold,
+                    'mean_shift_sd': self.mean_shift_threshold,
+                    'range_sigma': self.range_sigma,
+                    'min_samples': self.min_samples
+                },
+                'features': features,
+                'events': list(self.events)
+            }
@@ -0,0 +1,222 @@
+"""
+HTTP Body Compression
+- Request bodies sent with Content-Encoding gzip / deflate / zstd are
+  decompressed as a stream in front of Flask's JSON and multipart parsers.
+- The upload size limit is enforced on the decompressed byte count, so a small
+  compressed body cannot expand without bound (zip bombs get a 413).
+- Responses are gzip / zstd compressed when the client advertises support.
+"""
+
+import gzip
+import io
+import zlib
+
+from flask import request
+from werkzeug.exceptions import RequestEntityTooLarge, UnsupportedMediaType
+
+try:
+    import zstandard
+    ZSTD_AVAILABLE = True
+    ZSTD_ERRORS = (zstandard.ZstdError,)
+except ImportError:
+    ZSTD_AVAILABLE = False
+    ZSTD_ERRORS = ()
+
+READ_CHUNK = 64 * 1024
+# Cap on bytes produced per decompress call (bounds memory for highly compressible input)
+OUTPUT_CHUNK = 1024 * 1024
+MIN_RESPONSE_SIZE = 1024
+
+SUPPORTED_ENCODINGS = ('gzip', 'x-gzip', 'deflate') + (('zstd',) if ZSTD_AVAILABLE else ())
+
+
+class _CompressedInput:
+    """File-like view of the still-compressed body (honours the Content-Length bound)"""
+
+    def __init__(self, stream):
+        self._stream = stream
+
+    def read(self, size=-1):
+        return self._stream._read_raw()
+
+
+class DecompressingStream(io.RawIOBase):
+    """Read-only stream that inflates a compressed WSGI input on the fly"""
+
+    def __init__(self, raw, encoding, max_size, content_length=None):
+        self._raw = raw
+        self._encoding = encoding
+        self._max_size = max_size
+        self._remaining = content_length
+        self._buffer = bytearray()
+        self._pending = b''
+        self._total = 0
+        self._eof = False
+        self._decompressor = self._new_decompressor()
+
+    def _new_decompressor(self):
+        if self._encoding in ('gzip', 'x-gzip'):
+            return zlib.decompressobj(16 + zlib.MAX_WBITS)
+        if self._encoding == 'deflate':
+            return zlib.decompressobj()
+        # stream_reader pulls compressed input itself, so each read() can be capped at OUTPUT_CHUNK
+        return zstandard.ZstdDecompressor().stream_reader(_CompressedInput(self), read_size=READ_CHUNK,
+                                                          read_across_frames=True)
+
+    @property
+    def total(self):
+        """Decompressed bytes produced so far"""
+        return self._total
+
+    def readable(self):
+        return True
+
+    def _read_raw(self):
+        size = READ_CHUNK if self._remaining is None else min(READ_CHUNK, self._remaining)
+        data = self._raw.read(size) if size > 0 else b''
+        if self._remaining is not None:
+            self._remaining -= len(data)
+        return data
+
+    def _fill(self):
+        if self._encoding == 'zstd':
+            output = self._decompressor.read(OUTPUT_CHUNK)
+            self._eof = not output
+        else:
+            data = self._pending or self._read_raw()
+            self._pending = b''
+            if not data:
+                output = self._decompressor.flush()
+                self._eof = True
+            else:
+                output = self._decompressor.decompress(data, OUTPUT_CHUNK)
+                self._pending = self._decompressor.unconsumed_tail
+                # Concatenated gzip members: start a fresh decompressor on the remainder
+                if self._decompressor.eof and self._decompressor.unused_data:
+                    self._pending = self._decompressor.unused_data
+                    self._decompressor = self._new_decompressor()
+
+        self._total += len(output)
+        if self._total > self._max_size:
+            raise RequestEntityTooLarge(
+                f"Decompressed request body exceeds {self._max_size // (1024 * 1024)} MB"
+            )
+        self._buffer += output
+
+    def readinto(self, b):
+        try:
+            while not self._buffer and not self._eof:
+                self._fill()
+        except (zlib.error, *ZSTD_ERRORS) as e:
+            raise UnsupportedMediaType(f"Invalid {self._encoding} request body: {e}")
+
+        n = min(len(b), len(self._buffer))
+        b[:n] = self._buffer[:n]
+        del self._buffer[:n]
+        return n
+
+
+class DecompressingMiddleware:
+    """WSGI middleware swapping a compressed wsgi.input for a decompressing stream"""
+
+    def __init__(self, wsgi_app, max_size):
+        self.wsgi_app = wsgi_app
+        self.max_size = max_size
+
+    def __call__(self, environ, start_response):
+        encoding = environ.get('HTTP_CONTENT_ENCODING', '').strip().lower()
+        if encoding and encoding != 'identity':
+            if encoding not in SUPPORTED_ENCODINGS:
+                environ['medengine.unsupported_encoding'] = encoding
+            else:
+                content_length = environ.get('CONTENT_LENGTH')
+                stream = DecompressingStream(
+                    environ['wsgi.input'], encoding, self.max_size,
+                    int(content_length) if content_length else None
+                )
+                environ['wsgi.input'] = io.BufferedReader(stream, READ_CHUNK)
+                environ['medengine.decompressing_stream'] = stream
+                environ['wsgi.input_terminated'] = True
+                environ['medengine.decompressed'] = encoding
+                environ.pop('CONTENT_LENGTH', None)
+                environ.pop('HTTP_CONTENT_ENCODING', None)
+        return self.wsgi_app(environ, start_response)
+
+
+def _preferred_encoding(accept_encoding):
+    accepted = set()
+    for part in accept_encoding.split(','):
+        name, _, params = part.partition(';')
+        q = params.strip()[2:] if params.strip().startswith('q=') else '1'
+        try:
+            if float(q) > 0:
+                accepted.add(name.strip().lower())
+        except ValueError:
+            continue
+    if ZSTD_AVAILABLE and 'zstd' in accepted:
+        return 'zstd'
+    if 'gzip' in accepted:
+        return 'gzip'
+    return None
+
+
+def compress_response(response, accept_encoding, min_size=MIN_RESPONSE_SIZE):
+    """Compress a buffered response body in place if the client accepts it"""
+    response.vary.add('Accept-Encoding')
+    if (response.direct_passthrough or response.is_streamed or response.status_code < 200
+            or response.status_code >= 300 or 'Content-Encoding' in response.headers):
+        return response
+
+    encoding = _preferred_encoding(accept_encoding or '')
+    if encoding is None:
+        return response
+
+    body = response.get_data()
+    if len(body) < min_size:
+        return response
+
+    if encoding == 'zstd':
+        body = zstandard.ZstdCompressor(level=3).compress(body)
+    else:
+        body = gzip.compress(body, compresslevel=5)
+    response.set_data(body)
+    response.headers['Content-Encoding'] = encoding
+    return response
+
+
+def init_compression(app, max_size):
+    """
+    Enable compressed request bodies and responses on a Flask app
+
+    Args:
+        app (Flask): Application to wrap
+        max_size (int): Maximum decompressed request body size in bytes
+    """
+    app.config['MAX_CONTENT_LENGTH'] = max_size
+    app.wsgi_app = DecompressingMiddleware(app.wsgi_app, max_size)
+
+    @app.before_request
+    def _consume_compressed_body():
+        unsupported = request.environ.get('medengine.unsupported_encoding')
+        if unsupported:
+            raise UnsupportedMediaType(f"Unsupported Content-Encoding '{unsupported}'")
+
+        if request.content_length is not None and request.content_length > max_size:
+            raise RequestEntityTooLarge()
+
+        # Parse compressed bodies here so size-limit errors become 413s rather
+        # than being swallowed by the routes' generic error handling
+        if request.environ.get('medengine.decompressed'):
+            if request.mimetype in ('multipart/form-data', 'application/x-www-form-urlencoded'):
+                request.files  # streams the multipart parse through the decompressor
+            else:
+                request.get_data(cache=True)
+            # Werkzeug stops reading at MAX_CONTENT_LENGTH without an error, so a body that
+            # inflates past the limit would otherwise be parsed truncated
+            stream = request.environ['medengine.decompressing_stream']
+            if stream.total >= max_size and request.environ['wsgi.input'].read(1):
+                raise RequestEntityTooLarge(f"Decompressed request body exceeds {max_size // (1024 * 1024)} MB")
+
+    @app.after_request
+    def _compress(response):
+        return compress_response(response, request.headers.get('Accept-Encoding'))
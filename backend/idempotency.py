@@ -0,0 +1,96 @@
+"""
+Idempotent Request Replay
+Stores successful /predict responses under an idempotency key so a repeated
+submission (same file or payload re-uploaded, or a client retry carrying the
+same Idempotency-Key header) returns the stored result without re-scoring.
+Client keys are bound to a fingerprint of the request they were first used
+with; reusing one for a different request raises IdempotencyConflict.
+"""
+
+import hashlib
+import sqlite3
+import threading
+import time
+import zlib
+
+DEFAULT_TTL_SECONDS = 24 * 3600
+
+
+class IdempotencyConflict(Exception):
+    """An idempotency key was reused with a different request body"""
+
+
+def content_key(*parts):
+    """sha256 over the request parts (bytes, str or file-like objects read in chunks)"""
+    digest = hashlib.sha256()
+    for part in parts:
+        if hasattr(part, 'read'):
+            position = part.tell()
+            for block in iter(lambda: part.read(1 << 20), b''):
+                digest.update(block)
+            part.seek(position)
+        else:
+            digest.update(part if isinstance(part, bytes) else str(part).encode('utf-8'))
+        digest.update(b'\x00')
+    return digest.hexdigest()
+
+
+class IdempotencyStore:
+    """
+    SQLite-backed response cache keyed by idempotency key and model version
+
+    Entries expire after ttl_seconds; responses from another model version are
+    treated as misses so a model update never replays stale scores.
+    """
+
+    def __init__(self, db_path, ttl_seconds=DEFAULT_TTL_SECONDS, max_entries=10000):
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS idempotent_responses (
+                key TEXT PRIMARY KEY,
+                model_version TEXT NOT NULL,
+                created_at REAL NOT NULL,
+                body BLOB NOT NULL,
+                fingerprint TEXT
+            )
+        """)
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS idx_idempotent_created ON idempotent_responses (created_at)"
+        )
+        self._conn.commit()
+
+    def get(self, key, model_version, fingerprint=None):
+        """
+        Stored response body (bytes) for key, or None on miss / expiry / model change
+
+        Raises:
+            IdempotencyConflict: If the live entry was stored for a different request fingerprint
+        """
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT model_version, created_at, body, fingerprint FROM idempotent_responses WHERE key = ?", (key,)
+            ).fetchone()
+        if row is None or row[0] != model_version or time.time() - row[1] > self.ttl_seconds:
+            return None
+        if fingerprint is not None and row[3] != fingerprint:
+            raise IdempotencyConflict("Idempotency-Key was already used with a different request")
+        return zlib.decompress(row[2])
+
+    def put(self, key, model_version, body, fingerprint=None):
+        """Store a response body (compressed), pruning expired and overflow entries"""
+        now = time.time()
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO idempotent_responses (key, model_version, created_at, body, fingerprint) "
+                "VALUES (?, ?, ?, ?, ?)", (key, model_version, now, zlib.compress(body, 6), fingerprint)
+            )
+            self._conn.execute("DELETE FROM idempotent_responses WHERE created_at < ?", (now - self.ttl_seconds,))
+            self._conn.execute("""
+                DELETE FROM idempotent_responses WHERE key IN (
+                    SELECT key FROM idempotent_responses ORDER BY created_at DESC LIMIT -1 OFFSET ?
+                )
+            """, (self.max_entries,))
@@ -0,0 +1,145 @@
+"""
+Streaming Upload Ingestion
+Reads CSV and Excel (xlsx) uploads in fixed-size row blocks so large hospital
+exports are scored block by block instead of being loaded whole.
+"""
+
+import os
+import time
+
+import pandas as pd
+
+try:
+    from openpyxl import load_workbook
+    OPENPYXL_AVAILABLE = True
+except ImportError:
+    OPENPYXL_AVAILABLE = False
+
+YES_NO_COLUMNS = ['change', 'diabetes_med', 'A1Ctest', 'glucose_test']
+# Upload columns carrying the hospital's own patient id (first match wins)
+ID_COLUMNS = ('patient_id', 'patientId', 'uhid')
+EXCEL_EXTENSIONS = ('.xlsx', '.xlsm')
+DEFAULT_BLOCK_SIZE = 5000
+
+
+def normalize_block(df, feature_names):
+    """
+    Map Yes/No flags to 1/0 and return the model columns
+
+    Raises:
+        ValueError: If the upload lacks any model column (zero-filling it would score nonsense)
+    """
+    missing = [name for name in feature_names if name not in df.columns]
+    if missing:
+        raise ValueError(f"Upload is missing required feature columns: {missing}")
+    df = df.copy()
+    for col in YES_NO_COLUMNS:
+        if col in df.columns:
+            df[col] = df[col].replace({'Yes': 1, 'No': 0})
+    # Blank or non-numeric cells are left as they are and reported per row when scoring
+    return df[feature_names]
+
+
+def iter_csv_blocks(stream, block_size=DEFAULT_BLOCK_SIZE):
+    """Yield DataFrames of at most block_size rows from a CSV stream"""
+    yield from pd.read_csv(stream, chunksize=block_size)
+
+
+def iter_xlsx_blocks(stream, block_size=DEFAULT_BLOCK_SIZE, sheet=None):
+    """
+    Yield DataFrames of at most block_size rows from an xlsx workbook
+
+    The workbook is opened in read-only mode, so rows are streamed from the
+    sheet XML rather than materialising the whole workbook in memory.
+
+    Args:
+        stream: Path or seekable binary file object
+        block_size (int): Rows per block
+        sheet (str): Sheet name (defaults to the active sheet)
+    """
+    if not OPENPYXL_AVAILABLE:
+        raise ImportError("openpyxl is required for Excel uploads (pip install openpyxl)")
+
+    workbook = load_workbook(stream, read_only=True, data_only=True)
+    try:
+        worksheet = workbook[sheet] if sheet else workbook.active
+        rows = worksheet.iter_rows(values_only=True)
+        header = next(rows, None)
+        if header is None:
+            return
+        columns = [str(c).strip() if c is not None else f'column_{i}' for i, c in enumerate(header)]
+
+        block = []
+        for row in rows:
+            if all(v is None for v in row):
+                continue
+            block.append(row)
+            if len(block) >= block_size:
+                yield pd.DataFrame(block, columns=columns)
+                block = []
+        if block:
+            yield pd.DataFrame(block, columns=columns)
+    finally:
+        workbook.close()
+
+
+def is_excel_filename(filename):
+    return os.path.splitext(filename or '')[1].lower() in EXCEL_EXTENSIONS
+
+
+def iter_upload_blocks(file, block_size=DEFAULT_BLOCK_SIZE, sheet=None):
+    """Pick the CSV or xlsx block reader from the uploaded file's name"""
+    filename = getattr(file, 'filename', None) or (file if isinstance(file, str) else '')
+    stream = getattr(file, 'stream', file)
+    if is_excel_filename(filename):
+        return iter_xlsx_blocks(stream, block_size, sheet)
+    return iter_csv_blocks(stream, block_size)
+
+
+def score_upload(predictor, file, threshold=0.4, block_size=DEFAULT_BLOCK_SIZE, sheet=None, on_block=None,
+                 on_scored=None):
+    """
+    Score an uploaded CSV / xlsx file block by block
+
+    Args:
+        predictor (HospitalReadmissionPredictor): Loaded predictor
+        file: Werkzeug FileStorage, path or binary stream
+        threshold (float): Custom threshold for predictions
+        block_size (int): Rows read and scored per block
+        sheet (str): Excel sheet name (xlsx only)
+        on_block (callable): Optional hook called with each normalized feature block
+        on_scored (callable): Optional hook called with (feature block, its results, scoring seconds)
+
+    Returns:
+        list: Result dicts with 1-based patient_id across the whole file, plus
+              'source_patient_id' when the file has one of ID_COLUMNS; rows that
+              cannot be scored get {'error': ...}
+
+    Raises:
+        ValueError: If the upload lacks required feature columns
+    """
+    results = []
+    for block in iter_upload_blocks(file, block_size, sheet):
+        id_column = next((col for col in ID_COLUMNS if col in block.columns), None)
+        features = normalize_block(block, predictor.feature_names)
+        if on_block is not None:
+            on_block(features)
+
+        started = time.perf_counter()
+        # Unscoreable rows get an error result, as in predict_batch, instead of failing the upload
+        X_scaled, valid, errors = predictor._scale_valid(features)
+        scored = [None] * len(features)
+        for i, result in zip(valid, predictor.predict_matrix(X_scaled, threshold) if len(valid) else []):
+            scored[i] = result
+        for i, error in errors.items():
+            scored[i] = {'error': error}
+        if on_scored is not None:
+            on_scored(features, scored, time.perf_counter() - started)
+
+        source_ids = block[id_column].tolist() if id_column else [None] * len(block)
+        for result, source_id in zip(scored, source_ids):
+            result['patient_id'] = len(results) + 1
+            if not pd.isna(source_id):
+                result['source_patient_id'] = str(source_id)
+            results.append(result)
+    return results
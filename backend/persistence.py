@@ -0,0 +1,283 @@
+"""
+Bulk High-Risk Persistence
+Writes High/Medium patients from scored batches in bounded, concurrent,
+retried bulk batches through a pluggable sink:
+
+    sqlite:<path>        local SQLite table (default, offline)
+    jsonl:<path>         append-only JSON lines file
+    firestore[:<project>] Firestore (honours FIRESTORE_EMULATOR_HOST for local testing)
+"""
+
+import json
+import sqlite3
+import threading
+import time
+import uuid
+from abc import ABC, abstractmethod
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import datetime, timezone
+
+import numpy as np
+
+from cohort import RISK_BANDS, band_codes
+
+HIGH_RISK_COLLECTION = 'highRiskPatients'
+PERSISTED_BANDS = ('High', 'Medium')
+
+
+def high_risk_document_id(record):
+    """Deterministic document id (upload + patient), so a retried batch overwrites instead of duplicating"""
+    return f"{record['uploadId']}_{record['patientId']}".replace('/', '_')
+
+
+def build_high_risk_records(results, patients=None, uploaded_by='system', upload_id=None):
+    """
+    Turn scored results into highRiskPatients documents (High/Medium only)
+
+    Mirrors the document shape written by saveHighRiskPatients in
+    src/lib/firestore/high-risk-patients.ts.
+
+    Args:
+        results (list): Result dicts from HospitalReadmissionPredictor
+        patients (list): Source rows aligned with results (for ids, names, diagnosis info)
+        uploaded_by (str): Admin user id recorded on each document
+        upload_id (str): Id shared by this batch's documents (generated if omitted)
+
+    Returns:
+        list: Documents ready for a sink
+    """
+    scored = [(i, r) for i, r in enumerate(results) if 'error' not in r]
+    if not scored:
+        return []
+
+    probabilities = np.array([r['probabilities']['readmitted'] for _, r in scored], dtype=float)
+    labels = np.array([label for label, _ in RISK_BANDS])[band_codes(probabilities)]
+    keep = np.flatnonzero(np.isin(labels, PERSISTED_BANDS))
+
+    now = datetime.now(timezone.utc).isoformat()
+    upload_id = upload_id or uuid.uuid4().hex
+    records = []
+    for k in keep:
+        i, result = scored[k]
+        source = patients[i] if patients is not None and i < len(patients) else {}
+        threshold = result['threshold_used']
+
+        record = {
+            'patientId': str(source.get('patient_id', f"P{str(i + 1).zfill(3)}")),
+            'name': source.get('name', f"Patient {i + 1}"),
+            'riskLevel': labels[k],
+            'readmissionProbability': float(probabilities[k]),
+            'riskFactors': [f['factor'] for f in result.get('risk_factors', [])],
+            'confidence': f"{probabilities[k] * 100:.1f}%",
+            'mlPrediction': result['predictions'][f'custom_threshold_{threshold}']['result'],
+            'uploadedAt': now,
+            'uploadedBy': uploaded_by,
+            'lastUpdated': now,
+            'isActive': True,
+            'priority': 'Critical' if labels[k] == 'High' else 'High',
+            'followUpRequired': True,
+            'alertStatus': 'New',
+            'uploadId': upload_id
+        }
+
+        diagnosis = {key: source[col] for key, col in
+                     (('primary', 'diag_1'), ('secondary', 'diag_2'), ('tertiary', 'diag_3')) if col in source}
+        medical = {key: source[col] for key, col in
+                   (('timeInHospital', 'time_in_hospital'), ('medications', 'num_medications'),
+                    ('labProcedures', 'num_lab_procedures'), ('specialty', 'medical_specialty')) if col in source}
+        if diagnosis:
+            record['diagnosisInfo'] = diagnosis
+        if medical:
+            record['medicalInfo'] = medical
+        records.append(record)
+    return records
+
+
+# =============================================================================
+# SINKS
+# =============================================================================
+
+class HighRiskSink(ABC):
+    """Destination for persisted records; write_batch must be safe to call from worker threads"""
+
+    name = 'sink'
+
+    @abstractmethod
+    def write_batch(self, records):
+        """Write one batch (retried after a failure, so remote sinks should write idempotently)"""
+
+    def close(self):
+        pass
+
+
+class JsonlSink(HighRiskSink):
+    """Append-only JSON lines file (one document per line)"""
+
+    name = 'jsonl'
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        self._file = open(path, 'a', encoding='utf-8')
+
+    def write_batch(self, records):
+        payload = ''.join(json.dumps(record, default=str) + '\n' for record in records)
+        with self._lock:
+            self._file.write(payload)
+            self._file.flush()
+
+    def close(self):
+        self._file.close()
+
+
+class SqliteSink(HighRiskSink):
+    """Local SQLite table, one row per document; one transaction per batch"""
+
+    name = 'sqlite'
+
+    def __init__(self, path):
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS high_risk_patients (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                patient_id TEXT NOT NULL,
+                risk_level TEXT NOT NULL,
+                probability REAL NOT NULL,
+                uploaded_at TEXT NOT NULL,
+                document TEXT NOT NULL
+            )
+        """)
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS idx_high_risk_patient ON high_risk_patients (patient_id, uploaded_at)"
+        )
+        self._conn.commit()
+
+    def write_batch(self, records):
+        rows = [(r['patientId'], r['riskLevel'], r['readmissionProbability'], r['uploadedAt'],
+                 json.dumps(r, default=str)) for r in records]
+        with self._lock, self._conn:
+            self._conn.executemany(
+                "INSERT INTO high_risk_patients (patient_id, risk_level, probability, uploaded_at, document) "
+                "VALUES (?, ?, ?, ?, ?)", rows
+            )
+
+    def close(self):
+        self._conn.close()
+
+
+class FirestoreSink(HighRiskSink):
+    """
+    Firestore batched writes over one shared client (pooled gRPC channel)
+
+    Set FIRESTORE_EMULATOR_HOST=localhost:8080 to target the local emulator.
+    """
+
+    name = 'firestore'
+    MAX_BATCH_WRITES = 500
+
+    def __init__(self, project=None, collection=HIGH_RISK_COLLECTION):
+        try:
+            from google.cloud import firestore
+        except ImportError:
+            raise ImportError("google-cloud-firestore is required for the Firestore sink")
+
+        self._client = firestore.Client(project=project)
+        self._collection = self._client.collection(collection)
+
+    def write_batch(self, records):
+        for start in range(0, len(records), self.MAX_BATCH_WRITES):
+            batch = self._client.batch()
+            for record in records[start:start + self.MAX_BATCH_WRITES]:
+                document = dict(record)
+                for key in ('uploadedAt', 'lastUpdated'):
+                    document[key] = datetime.fromisoformat(document[key])
+                # Retries re-send the same ids: a commit whose response was lost is overwritten, not duplicated
+                batch.set(self._collection.document(high_risk_document_id(record)), document)
+            batch.commit()
+
+    def close(self):
+        self._client.close()
+
+
+def sink_from_uri(uri):
+    """Build a sink from 'sqlite:<path>', 'jsonl:<path>' or 'firestore[:<project>]'"""
+    kind, _, target = uri.partition(':')
+    if kind == 'sqlite':
+        return SqliteSink(target)
+    if kind == 'jsonl':
+        return JsonlSink(target)
+    if kind == 'firestore':
+        return FirestoreSink(project=target or None)
+    raise ValueError(f"Unknown high-risk sink '{uri}'")
+
+
+# =============================================================================
+# BULK WRITER
+# =============================================================================
+
+class BulkHighRiskWriter:
+    """
+    Split records into batches and write them concurrently with retries
+
+    Concurrency is bounded by max_workers; each failed batch is retried with
+    exponential backoff before being reported as failed.
+    """
+
+    def __init__(self, sink, batch_size=400, max_workers=4, max_retries=3, backoff=0.5):
+        self.sink = sink
+        self.batch_size = batch_size
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='high-risk-writer')
+
+    def _write_with_retry(self, batch):
+        for attempt in range(self.max_retries + 1):
+            try:
+                self.sink.write_batch(batch)
+                return len(batch), attempt
+            except Exception as e:
+                if attempt == self.max_retries:
+                    raise
+                delay = self.backoff * (2 ** attempt)
+                print(f"⚠️ {self.sink.name} batch write failed ({e}); retrying in {delay:.1f}s")
+                time.sleep(delay)
+
+    def write(self, records):
+        """
+        Persist records and wait for all batches
+
+        Returns:
+            dict: Written/failed counts, batch count, retries and elapsed seconds
+        """
+        started = time.perf_counter()
+        batches = [records[i:i + self.batch_size] for i in range(0, len(records), self.batch_size)]
+        futures = {self._executor.submit(self._write_with_retry, batch): batch for batch in batches}
+
+        written, failed, retries, errors = 0, 0, 0, []
+        for future in as_completed(futures):
+            try:
+                count, attempts = future.result()
+                written += count
+                retries += attempts
+            except Exception as e:
+                failed += len(futures[future])
+                errors.append(str(e))
+
+        summary = {
+            'sink': self.sink.name,
+            'written': written,
+            'failed': failed,
+            'batches': len(batches),
+            'retries': retries,
+            'errors': errors[:5],
+            'elapsed_seconds': round(time.perf_counter() - started, 4)
+        }
+        print(f"💾 Persisted {written} high-risk patients in {len(batches)} batches "
+              f"({failed} failed, {summary['elapsed_seconds']}s)")
+        return summary
+
+    def close(self):
+        self._executor.shutdown(wait=True)
+        self.sink.close()
@@ -2,7 +2,12 @@ import pandas as pd
 import numpy as np
 import joblib
 import os
+import copy
+import hashlib
 import warnings
+from cohort import RISK_BANDS, RISK_LEVELS, risk_label
+from columnar_export import FORMATS, PYARROW_AVAILABLE, ColumnarPredictionWriter
+from attribution import attribute_batch
 warnings.filterwarnings('ignore')
 
 class HospitalReadmissionPredictor:
@@ -11,14 +16,21 @@ class HospitalReadmissionPredictor:
     Loads trained Bagging SVM model and scaler for predictions
     """
     
-    def __init__(self, model_path=None, scaler_path=None):
-        """Initialize predictor with model and scaler"""
-        
+    def __init__(self, model_path=None, scaler_path=None, surrogate_path=None, compact=False):
+        """
+        Initialize predictor with model, scaler and optional surrogate screener
+
+        compact=True swaps the ensemble for float32 inference (see compact_inference.py);
+        run its equivalence check against the float64 model before enabling it.
+        """
+
         # Use relative paths if not specified
         if model_path is None:
             model_path = os.path.join(os.path.dirname(__file__), 'bagging_svm_model_final.pkl')
         if scaler_path is None:
             scaler_path = os.path.join(os.path.dirname(__file__), 'scaler.pkl')
+        if surrogate_path is None:
+            surrogate_path = os.path.join(os.path.dirname(__file__), 'surrogate_screener.pkl')
         
         # Define exact feature names from your training
         self.feature_names = [
@@ -45,12 +57,30 @@ class HospitalReadmissionPredictor:
         try:
             self.model = joblib.load(model_path)
             self.scaler = joblib.load(scaler_path)
+            self.model_version = self._file_fingerprint(model_path)
             print("✅ Model and Scaler loaded successfully!")
             print(f"📊 Ready to predict with {len(self.feature_names)} features")
         except Exception as e:
             print(f"❌ Error loading files: {e}")
             raise
-    
+
+        self.compact = compact
+        if compact:
+            from compact_inference import CompactBaggedSVM, model_nbytes
+            full_bytes = model_nbytes(self.model)
+            self.model = CompactBaggedSVM(self.model, self.scaler)
+            # Compact scores may differ in the last digits, so keep cached results apart
+            self.model_version += '-f32'
+            print(f"🪶 Compact float32 inference enabled "
+                  f"({full_bytes / 1e6:.1f} MB -> {self.model.nbytes / 1e6:.1f} MB of model arrays)")
+
+        # Optional fast screening tier (see surrogate.py)
+        self.surrogate = None
+        if surrogate_path and os.path.exists(surrogate_path):
+            from surrogate import SurrogateScreener
+            self.surrogate = SurrogateScreener.load(surrogate_path)
+            print(f"⚡ Surrogate screener loaded (band ±{self.surrogate.band:.3f})")
+
     def predict(self, patient_data, threshold=0.4, show_details=True):
         """
         Make prediction for a patient
@@ -81,38 +111,12 @@ class HospitalReadmissionPredictor:
             
             # Get predictions
             probabilities = self.model.predict_proba(X_scaled)[0]
-            prob_not_readmitted = probabilities[0]
-            prob_readmitted = probabilities[1]
             
             # Default prediction (0.5 threshold)
             default_pred = self.model.predict(X_scaled)[0]
             
-            # Custom threshold prediction
-            custom_pred = int(prob_readmitted >= threshold)
-            
             # Create result dictionary
-            result = {
-                'probabilities': {
-                    'not_readmitted': round(prob_not_readmitted, 4),
-                    'readmitted': round(prob_readmitted, 4)
-                },
-                'predictions': {
-                    'default_threshold_0.5': {
-                        'prediction': int(default_pred),
-                        'result': 'READMITTED' if default_pred == 1 else 'NOT READMITTED'
-                    },
-                    f'custom_threshold_{threshold}': {
-                        'prediction': custom_pred,
-                        'result': 'READMITTED' if custom_pred == 1 else 'NOT READMITTED'
-                    }
-                },
-                'risk_assessment': {
-                    'readmission_probability': f"{prob_readmitted*100:.1f}%",
-                    'risk_level': self._get_risk_level(prob_readmitted),
-                    'confidence': 'High' if max(probabilities) > 0.7 else 'Medium' if max(probabilities) > 0.55 else 'Low'
-                },
-                'threshold_used': threshold
-            }
+            result = self._build_result(probabilities, default_pred, threshold)
             
             # Display results if requested
             if show_details:
@@ -128,6 +132,11 @@ class HospitalReadmissionPredictor:
     def predict_batch(self, patients_list, threshold=0.4):
         """
         Predict for multiple patients
+
+        Identical feature rows are scored once and fanned back out (see
+        predict_matrix); patients with missing or non-numeric features get an
+        error result.
+        Falls back to per-patient prediction if the batch cannot be scaled.
         
         Args:
             patients_list (list): List of patient dictionaries
@@ -137,23 +146,310 @@ class HospitalReadmissionPredictor:
             list: List of prediction results
         """
         print(f"🔄 Processing {len(patients_list)} patients...")
-        
+
+        results = [None] * len(patients_list)
+        try:
+            X_scaled, valid, errors = self._scale_valid(patients_list)
+            scored = self.predict_matrix(X_scaled, threshold) if len(valid) else []
+        except Exception as e:
+            print(f"⚠️ Batch scoring failed ({e}); falling back to per-patient prediction")
+            valid, errors = range(len(patients_list)), {}
+            scored = [self.predict(patient, threshold, show_details=False) for patient in patients_list]
+
+        for i, error in errors.items():
+            results[i] = {'error': error}
+        for i, result in zip(valid, scored):
+            results[i] = result
+        for i, result in enumerate(results, 1):
+            result['patient_id'] = i
+            if 'error' in result:
+                print(f"   ❌ Patient {i}: {result['error']}")
+
+        return results
+
+    def scale_batch(self, patients):
+        """
+        Scale many patients in one vectorized call
+
+        Args:
+            patients (list | DataFrame): Patient dictionaries or a DataFrame with feature columns
+
+        Returns:
+            np.ndarray: Scaled feature matrix in training feature order
+        """
+        if not isinstance(patients, pd.DataFrame):
+            patients = list(patients)
+            if not all(isinstance(p, dict) for p in patients):
+                raise ValueError("Each patient must be a JSON object of features")
+        df = patients if isinstance(patients, pd.DataFrame) else pd.DataFrame(patients)
+
+        missing = set(self.feature_names) - set(df.columns)
+        if missing:
+            raise ValueError(f"Missing required features: {list(missing)}")
+
+        if self.compact:
+            return self.model.scale_frame(df[self.feature_names])
+        return self.scaler.transform(df[self.feature_names])
+
+    def _scale_valid(self, patients):
+        """
+        Scale the scoreable patients of a batch, reporting the rest per patient
+
+        Non-object patients, missing features and non-numeric / non-finite values
+        become an error for that patient instead of failing the whole batch.
+
+        Returns:
+            tuple: (scaled matrix of valid rows, their indices into patients, {index: error message})
+        """
+        errors = {}
+        if not isinstance(patients, pd.DataFrame):
+            patients = list(patients)
+            for i, patient in enumerate(patients):
+                if not isinstance(patient, dict):
+                    errors[i] = "Prediction error: patient_data must be a dictionary"
+                    continue
+                missing = set(self.feature_names) - set(patient.keys())
+                if missing:
+                    errors[i] = f"Prediction error: Missing required features: {list(missing)}"
+            rows = [patient for i, patient in enumerate(patients) if i not in errors]
+            candidates = np.array([i for i in range(len(patients)) if i not in errors], dtype=int)
+            df = pd.DataFrame(rows, columns=self.feature_names)
+        else:
+            missing = set(self.feature_names) - set(patients.columns)
+            if missing:
+                raise ValueError(f"Missing required features: {list(missing)}")
+            candidates = np.arange(len(patients))
+            df = patients
+
+        if len(candidates) == 0:
+            return np.empty((0, len(self.feature_names))), candidates, errors
+
+        numeric = df[self.feature_names].apply(pd.to_numeric, errors='coerce')
+        finite = np.isfinite(numeric.to_numpy(dtype=float)).all(axis=1)
+        for i in candidates[~finite]:
+            errors[int(i)] = "Prediction error: Non-numeric or missing feature values"
+        if not finite.any():
+            return np.empty((0, len(self.feature_names))), candidates[finite], errors
+        return self.scale_batch(numeric[finite]), candidates[finite], errors
+
+    def predict_proba_batch(self, patients):
+        """
+        Readmission probabilities for many patients with a single model call
+
+        Returns:
+            np.ndarray: Probability of readmission for each patient
+        """
+        return self.model.predict_proba(self.scale_batch(patients))[:, 1]
+
+    def predict_matrix(self, X_scaled, threshold=0.4):
+        """
+        Full result payloads for an already-scaled feature matrix (one model call)
+
+        Returns:
+            list: One result dict per row, same shape as predict()
+        """
+        X_unique, inverse = self._collapse_rows(X_scaled)
+        probabilities = self.model.predict_proba(X_unique)
+        # Bagging predict() is the argmax over predict_proba, so reuse the probabilities
+        default_preds = self.model.classes_[np.argmax(probabilities, axis=1)]
+        unique_results = [self._build_result(p, d, threshold) for p, d in zip(probabilities, default_preds)]
+        # First occurrence keeps the built result; repeats get a deep copy, so per-row
+        # edits (patient_id, nested probabilities / predictions) never leak across rows
+        used = np.zeros(len(unique_results), dtype=bool)
         results = []
-        for i, patient in enumerate(patients_list, 1):
-            print(f"\n👤 Patient {i}:")
-            result = self.predict(patient, threshold, show_details=False)
+        for u in inverse:
+            results.append(copy.deepcopy(unique_results[u]) if used[u] else unique_results[u])
+            used[u] = True
+        return results
+
+    @staticmethod
+    def _collapse_rows(X_scaled):
+        """
+        Distinct feature vectors of a batch plus the row -> distinct index map
+
+        Re-uploads and repeated encounter rows are common, so each distinct
+        vector is scored once and the results fanned back out via `inverse`.
+        """
+        X_unique, inverse = np.unique(X_scaled, axis=0, return_inverse=True)
+        inverse = inverse.reshape(-1)
+        if len(X_unique) < len(X_scaled):
+            print(f"🔁 Collapsed {len(X_scaled)} rows to {len(X_unique)} distinct feature vectors")
+        return X_unique, inverse
+
+    def predict_explained(self, patients, threshold=0.4, top_n=3, explain_from=RISK_BANDS[-2][1]):
+        """
+        Vectorized batch prediction with per-patient risk drivers
+
+        Occlusion (see attribution.py) scores one extra copy of a row per
+        feature group (16), so it is only run for rows at or above
+        `explain_from` (Medium and High by default); the rest get an empty
+        'risk_factors' list. Patients that cannot be scored get an error
+        result, as in predict_batch.
+
+        Returns:
+            list: Result dicts (same shape as predict_batch) with a 'risk_factors' list
+        """
+        X_scaled, valid, errors = self._scale_valid(patients)
+        results = [None] * (len(valid) + len(errors))
+        for i, error in errors.items():
+            results[i] = {'error': error}
+
+        if len(valid):
+            X_unique, inverse = self._collapse_rows(X_scaled)
+            probabilities = self.model.predict_proba(X_unique)
+            default_preds = self.model.classes_[np.argmax(probabilities, axis=1)]
+            drivers = [[] for _ in range(len(X_unique))]
+            explain = np.flatnonzero(probabilities[:, 1] >= explain_from)
+            if len(explain):
+                explained = attribute_batch(self.model, X_unique[explain], self.feature_names,
+                                            probabilities[explain, 1], top_n)
+                for u, factors in zip(explain, explained):
+                    drivers[u] = factors
+
+            for i, u in zip(valid, inverse):
+                result = self._build_result(probabilities[u], default_preds[u], threshold)
+                result['risk_factors'] = [dict(factor) for factor in drivers[u]]
+                results[i] = result
+
+        for i, result in enumerate(results, 1):
             result['patient_id'] = i
-            results.append(result)
-            
-            if 'error' not in result:
-                prob = result['probabilities']['readmitted']
-                pred = result['predictions'][f'custom_threshold_{threshold}']['result']
-                print(f"   Risk: {prob*100:.1f}% | Prediction: {pred}")
-            else:
-                print(f"   ❌ {result['error']}")
-        
         return results
-    
+
+    def iter_score_chunks(self, df, chunk_size=5000):
+        """
+        Stream a feature DataFrame through the model in fixed-size chunks
+
+        Yields:
+            tuple: (start_row, readmission probabilities, default 0.5-threshold predictions)
+        """
+        for start in range(0, len(df), chunk_size):
+            probabilities = self.model.predict_proba(self.scale_batch(df.iloc[start:start + chunk_size]))
+            yield start, probabilities[:, 1], self.model.classes_[np.argmax(probabilities, axis=1)]
+
+    def screen_batch(self, patients, threshold=0.4):
+        """
+        Two-tier screening: surrogate scores everyone, exact ensemble only
+        re-scores patients whose surrogate probability is near the threshold
+
+        Returns:
+            tuple: (probabilities, exact_mask) where exact_mask marks rows scored by the ensemble
+        """
+        X_scaled = self.scale_batch(patients)
+
+        if self.surrogate is None:
+            return self.model.predict_proba(X_scaled)[:, 1], np.ones(len(X_scaled), dtype=bool)
+
+        probabilities = self.surrogate.predict_proba(X_scaled)
+        exact_mask = np.abs(probabilities - threshold) <= self.surrogate.band
+        if exact_mask.any():
+            probabilities[exact_mask] = self.model.predict_proba(X_scaled[exact_mask])[:, 1]
+
+        return probabilities, exact_mask
+
+    def _build_result(self, probabilities, default_pred, threshold):
+        """Assemble the nested result payload for one patient from its class probabilities"""
+        prob_not_readmitted = probabilities[0]
+        prob_readmitted = probabilities[1]
+
+        # Custom threshold prediction
+        custom_pred = int(prob_readmitted >= threshold)
+
+        return {
+            'probabilities': {
+                'not_readmitted': round(prob_not_readmitted, 4),
+                'readmitted': round(prob_readmitted, 4)
+            },
+            'predictions': {
+                'default_threshold_0.5': {
+                    'prediction': int(default_pred),
+                    'result': 'READMITTED' if default_pred == 1 else 'NOT READMITTED'
+                },
+                f'custom_threshold_{threshold}': {
+                    'prediction': custom_pred,
+                    'result': 'READMITTED' if custom_pred == 1 else 'NOT READMITTED'
+                }
+            },
+            'risk_assessment': {
+                'readmission_probability': f"{prob_readmitted*100:.1f}%",
+                'risk_level': self._get_risk_level(prob_readmitted),
+                'confidence': 'High' if max(probabilities) > 0.7 else 'Medium' if max(probabilities) > 0.55 else 'Low'
+            },
+            'threshold_used': threshold
+        }
+
+    def predict_top_risk(self, patients_list, threshold=0.4, min_probability=None, top_k=None, include_rest=True,
+                         explain_top_n=0):
+        """
+        Score a cohort in one pass and build full result payloads only for the
+        highest-risk patients
+
+        Args:
+            patients_list (list | DataFrame): Patient dictionaries or feature DataFrame
+            threshold (float): Custom threshold for the detailed predictions
+            min_probability (float): Keep only patients at or above this probability
+            top_k (int): Keep at most this many patients (highest probability first)
+            include_rest (bool): Return unselected patients as compact id/probability pairs
+            explain_top_n (int): Attach this many risk drivers to each selected patient (0 = none)
+
+        Returns:
+            dict: {'selected': [full results], 'others': [compact rows] or None,
+                   'errors': [per-patient errors], 'total': int}
+
+        Raises:
+            ValueError: If top_k < 1 or min_probability is outside [0, 1]
+        """
+        if top_k is not None and top_k < 1:
+            raise ValueError("top_k must be a positive integer")
+        if min_probability is not None and not 0.0 <= min_probability <= 1.0:
+            raise ValueError("min_probability must be within [0, 1]")
+
+        X_scaled, valid, errors = self._scale_valid(patients_list)
+        probabilities = self.model.predict_proba(X_scaled) if len(valid) else np.empty((0, 2))
+        readmitted = probabilities[:, 1]
+
+        # Positions below index into the valid rows; valid[...] maps back to input rows
+        candidates = np.arange(len(readmitted))
+        if min_probability is not None:
+            candidates = np.flatnonzero(readmitted >= min_probability)
+        if top_k is not None and len(candidates) > top_k:
+            # Partial selection: O(n) instead of sorting the whole cohort
+            keep = np.argpartition(-readmitted[candidates], top_k - 1)[:top_k]
+            candidates = candidates[keep]
+        selected = candidates[np.argsort(-readmitted[candidates], kind='stable')]
+
+        # Bagging predict() is the argmax over predict_proba, so reuse the probabilities
+        default_preds = self.model.classes_[np.argmax(probabilities[selected], axis=1)]
+
+        drivers = [None] * len(selected)
+        if explain_top_n and len(selected):
+            drivers = attribute_batch(self.model, X_scaled[selected], self.feature_names,
+                                      readmitted[selected], explain_top_n)
+
+        results = []
+        for row, default_pred, factors in zip(selected, default_preds, drivers):
+            result = self._build_result(probabilities[row], default_pred, threshold)
+            result['patient_id'] = int(valid[row]) + 1
+            if factors is not None:
+                result['risk_factors'] = factors
+            results.append(result)
+
+        others = None
+        if include_rest:
+            rest = np.ones(len(readmitted), dtype=bool)
+            rest[selected] = False
+            rest_idx = np.flatnonzero(rest)
+            others = [
+                {'patient_id': int(valid[i]) + 1, 'probability': round(float(p), 4)}
+                for i, p in zip(rest_idx, readmitted[rest_idx])
+            ]
+
+        return {
+            'selected': results,
+            'others': others,
+            'errors': [{'patient_id': i + 1, 'error': error} for i, error in sorted(errors.items())],
+            'total': len(valid) + len(errors)
+        }
+
     def quick_predict(self, patient_data, threshold=0.4):
         """
         Quick prediction with minimal output
@@ -172,16 +468,18 @@ class HospitalReadmissionPredictor:
         
         return pred_text, probability, risk_level
     
+    @staticmethod
+    def _file_fingerprint(path):
+        """Short content hash identifying a model file (used to invalidate cached scores)"""
+        digest = hashlib.sha256()
+        with open(path, 'rb') as f:
+            for block in iter(lambda: f.read(1 << 20), b''):
+                digest.update(block)
+        return digest.hexdigest()[:12]
+
     def _get_risk_level(self, probability):
-        """Determine risk level based on probability"""
-        if probability >= 0.7:
-            return "HIGH RISK"
-        elif probability >= 0.5:
-            return "MEDIUM RISK"
-        elif probability >= 0.3:
-            return "LOW-MEDIUM RISK"
-        else:
-            return "LOW RISK"
+        """Determine risk level based on probability (cut-offs live in cohort.RISK_LEVELS)"""
+        return risk_label(probability, RISK_LEVELS)
     
     def _display_results(self, result):
         """Display formatted prediction results"""
@@ -231,12 +529,15 @@ class HospitalReadmissionPredictor:
 # =============================================================================
 # PERFECT USAGE EXAMPLES
 # =============================================================================
-def example_usage(csv_file='/Users/keerthevasan/Documents/Study/medengine-main/backend/synthetic_dataset_sample.csv', threshold=0.4):
+def example_usage(csv_file='/Users/keerthevasan/Documents/Study/medengine-main/backend/synthetic_dataset_sample.csv', threshold=0.4,
+                  output_path='batch_predictions.parquet', chunk_size=5000):
     """
     Load patient data from CSV and predict readmission risk for all patients
     Args:
         csv_file (str): Path to CSV file with patient features
         threshold (float): Custom threshold for predictions
+        output_path (str): .parquet / .arrow for columnar output, .csv for the row-dict CSV
+        chunk_size (int): Rows per scoring chunk (one row group each) in columnar mode
     """
     print("🚀 INITIALIZING PREDICTOR...")
     predictor = HospitalReadmissionPredictor()
@@ -254,6 +555,21 @@ def example_usage(csv_file='/Users/keerthevasan/Documents/Study/medengine-main/b
     for col in yes_no_columns:
         if col in df_patients.columns:
             df_patients[col] = df_patients[col].map({'Yes': 1, 'No': 0}).fillna(0)
+
+    # Columnar path: stream chunks straight into Parquet / Arrow IPC
+    if output_path.endswith(tuple(FORMATS)):
+        if PYARROW_AVAILABLE:
+            features = df_patients.reindex(columns=predictor.feature_names, fill_value=0.0)
+            print("\n🔥 PREDICTING BATCH OF PATIENTS (streaming)...")
+            with ColumnarPredictionWriter(output_path, threshold=threshold) as writer:
+                for start, probabilities, default_preds in predictor.iter_score_chunks(features, chunk_size):
+                    writer.write_chunk(np.arange(start, start + len(probabilities)) + 1,
+                                       probabilities, default_preds)
+            print(f"\n✅ {writer.rows_written} batch predictions saved to '{output_path}'")
+            return
+        print("⚠️ pyarrow not installed - falling back to CSV output")
+        output_path = os.path.splitext(output_path)[0] + '.csv'
+
     # Convert each row to dictionary with correct features
     patient_dicts = []
     for i, row in df_patients.iterrows():
@@ -275,9 +591,8 @@ def example_usage(csv_file='/Users/keerthevasan/Documents/Study/medengine-main/b
         row.update(res['risk_assessment'])
         results_to_save.append(row)
     
-    output_csv = 'batch_predictions.csv'
-    pd.DataFrame(results_to_save).to_csv(output_csv, index=False)
-    print(f"\n✅ Batch predictions saved to '{output_csv}'")
+    pd.DataFrame(results_to_save).to_csv(output_path, index=False)
+    print(f"\n✅ Batch predictions saved to '{output_path}'")
 
 
 # =============================================================================
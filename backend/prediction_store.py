@@ -0,0 +1,142 @@
+"""
+Local Prediction Store
+Append-only SQLite history of prediction results, indexed by patient,
+model version and timestamp. Works fully offline (no external database).
+"""
+
+import sqlite3
+import threading
+from datetime import datetime
+
+from cohort import risk_label
+
+COLUMNS = ['patient_id', 'model_version', 'scored_at', 'probability',
+           'prediction', 'risk_band', 'risk_level', 'threshold']
+
+
+class PredictionStore:
+    """
+    Batched writer + indexed queries over scored results
+
+    Results are written in one transaction per `batch_size` rows, so a scored
+    batch costs a handful of executemany calls rather than one write per patient.
+    """
+
+    def __init__(self, db_path, batch_size=1000):
+        self.batch_size = batch_size
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS predictions (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                patient_id TEXT NOT NULL,
+                model_version TEXT NOT NULL,
+                scored_at TEXT NOT NULL,
+                probability REAL NOT NULL,
+                prediction INTEGER NOT NULL,
+                risk_band TEXT NOT NULL,
+                risk_level TEXT NOT NULL,
+                threshold REAL NOT NULL
+            )
+        """)
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS idx_predictions_patient ON predictions (patient_id, scored_at)"
+        )
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS idx_predictions_scored ON predictions (scored_at, probability)"
+        )
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS idx_predictions_model ON predictions (model_version, scored_at)"
+        )
+        self._conn.commit()
+
+    def record(self, results, model_version, patient_ids=None, scored_at=None):
+        """
+        Append a scored batch
+
+        Args:
+            results (list): Result dicts as returned by HospitalReadmissionPredictor
+            model_version (str): Model fingerprint the results came from
+            patient_ids (list): Ids aligned with results (defaults to each result's 'patient_id')
+            scored_at (str): ISO timestamp for the batch (defaults to now)
+
+        Returns:
+            int: Number of rows written (error results and rows without an id are skipped)
+        """
+        scored_at = scored_at or datetime.now().isoformat(timespec='seconds')
+        if patient_ids is None:
+            patient_ids = [result.get('patient_id') for result in results]
+
+        rows = []
+        for patient_id, result in zip(patient_ids, results):
+            if 'error' in result or patient_id is None:
+                continue
+            probability = float(result['probabilities']['readmitted'])
+            threshold = result['threshold_used']
+            rows.append((
+                str(patient_id), model_version, scored_at, probability,
+                int(result['predictions'][f'custom_threshold_{threshold}']['prediction']),
+                risk_label(probability), result['risk_assessment']['risk_level'], threshold
+            ))
+
+        with self._lock:
+            for start in range(0, len(rows), self.batch_size):
+                with self._conn:
+                    self._conn.executemany(
+                        f"INSERT INTO predictions ({', '.join(COLUMNS)}) VALUES ({', '.join('?' * len(COLUMNS))})",
+                        rows[start:start + self.batch_size]
+                    )
+        return len(rows)
+
+    def latest(self, patient_id):
+        """Most recent stored score for one patient (None if never scored)"""
+        with self._lock:
+            row = self._conn.execute(
+                f"SELECT {', '.join(COLUMNS)} FROM predictions WHERE patient_id = ? "
+                f"ORDER BY scored_at DESC, id DESC LIMIT 1", (str(patient_id),)
+            ).fetchone()
+        return dict(row) if row else None
+
+    def history(self, patient_id, limit=100):
+        """Score history for one patient, newest first"""
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT {', '.join(COLUMNS)} FROM predictions WHERE patient_id = ? "
+                f"ORDER BY scored_at DESC, id DESC LIMIT ?", (str(patient_id), limit)
+            ).fetchall()
+        return [dict(row) for row in rows]
+
+    def query(self, min_probability=None, since=None, until=None, model_version=None, limit=1000):
+        """
+        Scores matching the filters, highest probability first
+
+        Args:
+            min_probability (float): Only scores at or above this probability
+            since (str): ISO date/timestamp lower bound on scored_at (inclusive)
+            until (str): ISO date/timestamp upper bound on scored_at (exclusive)
+            model_version (str): Restrict to one model version
+            limit (int): Maximum rows returned
+        """
+        clauses, params = [], []
+        if since:
+            clauses.append("scored_at >= ?")
+            params.append(since)
+        if until:
+            clauses.append("scored_at < ?")
+            params.append(until)
+        if min_probability is not None:
+            clauses.append("probability >= ?")
+            params.append(float(min_probability))
+        if model_version:
+            clauses.append("model_version = ?")
+            params.append(model_version)
+
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT {', '.join(COLUMNS)} FROM predictions {where} "
+                f"ORDER BY probability DESC LIMIT ?", params + [int(limit)]
+            ).fetchall()
+        return [dict(row) for row in rows]
@@ -0,0 +1,117 @@
+"""
+On-Demand Request Profiling
+Debug facility for slow uploads: when enabled in config, a request carrying
+`X-Profile: 1` (or `?profile=1`) runs under cProfile from the first
+before_request hook to the last after_request hook, so body parsing, scoring
+and JSON serialization are all covered. Each profile is written as a pstats
+file plus a text summary; only the newest `keep` profiles are retained.
+
+Nothing is registered when profiling is disabled, so normal requests pay nothing.
+"""
+
+import cProfile
+import io
+import os
+import pstats
+import threading
+import time
+from datetime import datetime
+
+from flask import g, request
+
+SUMMARY_LINES = 40
+
+
+def _wants_profile():
+    return request.headers.get('X-Profile', '').lower() in ('1', 'true') or \
+        request.args.get('profile', '').lower() in ('1', 'true')
+
+
+def prune_profiles(profile_dir, keep):
+    """Delete all but the newest `keep` profiles (pstats file and its summary)"""
+    profiles = sorted(
+        (name for name in os.listdir(profile_dir) if name.endswith('.prof')),
+        key=lambda name: os.path.getmtime(os.path.join(profile_dir, name)),
+        reverse=True
+    )
+    for name in profiles[keep:]:
+        base = os.path.join(profile_dir, name[:-len('.prof')])
+        for path in (base + '.prof', base + '.txt'):
+            if os.path.exists(path):
+                os.remove(path)
+
+
+def write_profile(profiler, profile_dir, label, elapsed):
+    """
+    Dump one request profile
+
+    Returns:
+        str: Profile id (file name without extension)
+    """
+    profile_id = f"{datetime.now().strftime('%Y%m%d-%H%M%S-%f')}_{label}_{elapsed * 1000:.0f}ms"
+    base = os.path.join(profile_dir, profile_id)
+    profiler.dump_stats(base + '.prof')
+
+    summary = io.StringIO()
+    stats = pstats.Stats(profiler, stream=summary)
+    stats.sort_stats('cumulative').print_stats(SUMMARY_LINES)
+    with open(base + '.txt', 'w') as f:
+        f.write(f"{request.method} {request.full_path} ({elapsed:.3f}s)\n")
+        f.write(summary.getvalue())
+    return profile_id
+
+
+def init_profiling(app, profile_dir, keep=20):
+    """
+    Enable on-demand profiling on a Flask app
+
+    Call before other extensions register their request hooks so the profile
+    spans them too.
+
+    Args:
+        app (Flask): Application to instrument
+        profile_dir (str): Directory for .prof / .txt output
+        keep (int): Number of most recent profiles to retain
+    """
+    os.makedirs(profile_dir, exist_ok=True)
+    # cProfile allows one active profiler per process; concurrent requests run unprofiled
+    busy = threading.Lock()
+
+    @app.before_request
+    def _start_profile():
+        if not _wants_profile() or not busy.acquire(blocking=False):
+            return
+        g.profiler = cProfile.Profile()
+        g.profile_started = time.perf_counter()
+        g.profiler.enable()
+
+    @app.after_request
+    def _stop_profile(response):
+        profiler = g.pop('profiler', None)
+        if profiler is None:
+            if _wants_profile():
+                response.headers['X-Profile-Skipped'] = 'profiler busy'
+            return response
+
+        profiler.disable()
+        busy.release()
+        elapsed = time.perf_counter() - g.pop('profile_started')
+        try:
+            label = request.path.strip('/').replace('/', '-') or 'root'
+            profile_id = write_profile(profiler, profile_dir, label, elapsed)
+            prune_profiles(profile_dir, keep)
+            response.headers['X-Profile-Id'] = profile_id
+            print(f"🔬 Profiled {request.path} in {elapsed:.3f}s -> {profile_id}.prof")
+        except Exception as e:
+            print(f"⚠️ Failed to write profile: {e}")
+        return response
+
+    @app.teardown_request
+    def _abandon_profile(exc):
+        # after_request is skipped on unhandled errors; make sure the profiler is released
+        profiler = g.pop('profiler', None)
+        if profiler is not None:
+            profiler.disable()
+            busy.release()
+
+    print(f"🔬 Request profiling enabled (X-Profile: 1 or ?profile=1, output: '{profile_dir}', keep {keep})")
@@ -0,0 +1,147 @@
+"""
+Incremental Rescoring
+Keeps a per-patient fingerprint of the last scored feature vector and model
+version in SQLite so repeated census uploads only re-score changed patients.
+"""
+
+import json
+import sqlite3
+import threading
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+SQLITE_MAX_PARAMS = 900
+
+
+class IncrementalRescorer:
+    """
+    Rescore only new or changed patients
+
+    Patients are identified by their 'patient_id' field. A patient is re-scored
+    when it has never been seen, its feature fingerprint changed, or the stored
+    score came from a different model version.
+    """
+
+    def __init__(self, predictor, db_path, threshold=0.4):
+        self.predictor = predictor
+        self.threshold = threshold
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS patient_scores (
+                patient_id TEXT PRIMARY KEY,
+                fingerprint INTEGER NOT NULL,
+                model_version TEXT NOT NULL,
+                threshold REAL NOT NULL,
+                result TEXT NOT NULL,
+                scored_at TEXT NOT NULL
+            )
+        """)
+        self._conn.commit()
+
+    def _fingerprints(self, features):
+        """64-bit hash per feature row (values normalised to float so 1 and 1.0 match)"""
+        hashes = pd.util.hash_pandas_object(features.astype(float), index=False).values
+        return hashes.view(np.int64)
+
+    def _load(self, patient_ids):
+        """Stored (fingerprint, model_version, threshold, result) keyed by patient id"""
+        stored = {}
+        for start in range(0, len(patient_ids), SQLITE_MAX_PARAMS):
+            chunk = patient_ids[start:start + SQLITE_MAX_PARAMS]
+            rows = self._conn.execute(
+                f"SELECT patient_id, fingerprint, model_version, threshold, result FROM patient_scores "
+                f"WHERE patient_id IN ({','.join('?' * len(chunk))})", chunk
+            ).fetchall()
+            stored.update({row[0]: row[1:] for row in rows})
+        return stored
+
+    def rescore(self, patients, mode='delta'):
+        """
+        Score only rows whose features or model version changed
+
+        Args:
+            patients (list | DataFrame): Patient rows with 'patient_id' plus the model features
+            mode (str): 'delta' - upload is a partial update, return the whole stored census
+                        'full'  - upload is the complete census, forget patients not in it
+
+        Returns:
+            dict: {'results': [...], 'scored': int, 'unchanged': int, 'removed': int,
+                   'rescored': [results computed in this call]}
+        """
+        if mode not in ('delta', 'full'):
+            raise ValueError("mode must be 'delta' or 'full'")
+
+        df = patients if isinstance(patients, pd.DataFrame) else pd.DataFrame(list(patients))
+        if 'patient_id' not in df.columns:
+            raise ValueError("Every patient needs a 'patient_id' for incremental rescoring")
+
+        df = df.assign(patient_id=df['patient_id'].astype(str)).drop_duplicates('patient_id', keep='last')
+        df = df.reset_index(drop=True)
+        missing = set(self.predictor.feature_names) - set(df.columns)
+        if missing:
+            raise ValueError(f"Missing required features: {list(missing)}")
+
+        ids = df['patient_id'].tolist()
+        fingerprints = self._fingerprints(df[self.predictor.feature_names])
+        version = self.predictor.model_version
+
+        with self._lock:
+            stored = self._load(ids)
+
+            # Vectorized diff against the stored fingerprints
+            stored_fp = np.array([stored[i][0] if i in stored else 0 for i in ids], dtype=np.int64)
+            is_current = np.array([
+                i in stored and stored[i][1] == version and stored[i][2] == self.threshold for i in ids
+            ], dtype=bool)
+            changed = ~is_current | (stored_fp != fingerprints)
+            changed_idx = np.flatnonzero(changed)
+
+            results = {}
+            if len(changed_idx):
+                X_scaled = self.predictor.scale_batch(df.iloc[changed_idx])
+                scored_at = datetime.now().isoformat()
+                rows = []
+                for row, result in zip(changed_idx, self.predictor.predict_matrix(X_scaled, self.threshold)):
+                    result['patient_id'] = ids[row]
+                    results[ids[row]] = result
+                    rows.append((ids[row], int(fingerprints[row]), version, self.threshold,
+                                 json.dumps(result, default=float), scored_at))
+                self._conn.executemany(
+                    "INSERT OR REPLACE INTO patient_scores VALUES (?, ?, ?, ?, ?, ?)", rows
+                )
+
+            removed = 0
+            if mode == 'full':
+                self._conn.execute("CREATE TEMP TABLE IF NOT EXISTS census (patient_id TEXT PRIMARY KEY)")
+                self._conn.execute("DELETE FROM census")
+                self._conn.executemany("INSERT INTO census VALUES (?)", [(i,) for i in ids])
+                removed = self._conn.execute(
+                    "DELETE FROM patient_scores WHERE patient_id NOT IN (SELECT patient_id FROM census)"
+                ).rowcount
+            self._conn.commit()
+
+            for i in ids:
+                if i not in results:
+                    results[i] = json.loads(stored[i][3])
+
+            if mode == 'delta':
+                merged = [
+                    results.get(pid) or json.loads(result)
+                    for pid, result in self._conn.execute(
+                        "SELECT patient_id, result FROM patient_scores ORDER BY patient_id"
+                    )
+                ]
+            else:
+                merged = [results[i] for i in ids]
+
+        return {
+            'results': merged,
+            'scored': int(len(changed_idx)),
+            'unchanged': int(len(ids) - len(changed_idx)),
+            'removed': int(removed),
+            'rescored': [results[ids[row]] for row in changed_idx],
+            'model_version': version
+        }
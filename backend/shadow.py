@@ -0,0 +1,193 @@
+"""
+Shadow Model Evaluation
+Mirrors scored /predict batches to a candidate HospitalReadmissionPredictor on
+a separate bounded worker pool, off the response path. Agreement, probability
+deltas and latency are accumulated for the /shadow endpoint. When the
+candidate falls behind, new batches are dropped (load shedding) rather than
+queued, so primary requests never wait on the shadow.
+"""
+
+import queue
+import threading
+import time
+from collections import deque
+from datetime import datetime
+
+import numpy as np
+
+from cohort import RISK_BANDS, band_codes
+
+DELTA_EDGES = [0.01, 0.05, 0.1, 0.2]
+LATENCY_WINDOW = 1000
+# Upper bounds for the shadow pool (registration is a request body; keep it from spawning unbounded threads)
+MAX_WORKERS = 4
+MAX_QUEUE = 64
+
+
+class ShadowEvaluator:
+    """
+    Score mirrored batches with a candidate model and compare to the primary
+
+    Args:
+        candidate (HospitalReadmissionPredictor): Model under evaluation
+        primary_version (str): Model version of the serving predictor
+        threshold (float): Decision threshold for agreement
+        max_queue (int): Batches waiting for the shadow before new ones are shed (1..MAX_QUEUE)
+        workers (int): Shadow scoring threads (1..MAX_WORKERS)
+    """
+
+    def __init__(self, candidate, primary_version, threshold=0.4, max_queue=8, workers=1):
+        self.check_limits(max_queue, workers)
+        self.candidate = candidate
+        self.primary_version = primary_version
+        self.threshold = threshold
+        self.registered_at = datetime.now().isoformat(timespec='seconds')
+
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+
+        self.mirrored = self.scored = self.shed = self.failed = 0
+        self.rows_scored = self.rows_shed = 0
+        self.decision_agree = self.band_agree = 0
+        self.primary_only_positive = self.shadow_only_positive = 0
+        self.delta_sum = self.abs_delta_sum = self.max_abs_delta = 0.0
+        self.delta_hist = np.zeros(len(DELTA_EDGES) + 1, dtype=np.int64)
+        self.primary_seconds = self.shadow_seconds = 0.0
+        self.primary_latency = deque(maxlen=LATENCY_WINDOW)
+        self.shadow_latency = deque(maxlen=LATENCY_WINDOW)
+        self.last_error = None
+
+        self._workers = [
+            threading.Thread(target=self._run, name=f'shadow-worker-{i}', daemon=True) for i in range(workers)
+        ]
+        for worker in self._workers:
+            worker.start()
+
+    @staticmethod
+    def check_limits(max_queue, workers):
+        """Raise ValueError unless the queue / worker counts are within the pool bounds"""
+        if not 1 <= workers <= MAX_WORKERS:
+            raise ValueError(f"workers must be between 1 and {MAX_WORKERS}")
+        if not 1 <= max_queue <= MAX_QUEUE:
+            raise ValueError(f"max_queue must be between 1 and {MAX_QUEUE}")
+
+    def submit(self, patients, primary_probabilities, primary_seconds):
+        """
+        Mirror one scored batch (never blocks)
+
+        Args:
+            patients (list | DataFrame): Rows the primary scored successfully
+            primary_probabilities (array): Primary readmission probabilities, aligned with patients
+            primary_seconds (float): Primary scoring time for the batch
+
+        Returns:
+            bool: False if the batch was shed because the shadow is behind
+        """
+        try:
+            self._queue.put_nowait((patients, np.asarray(primary_probabilities, dtype=float), primary_seconds))
+        except queue.Full:
+            with self._lock:
+                self.shed += 1
+                self.rows_shed += len(primary_probabilities)
+            return False
+        with self._lock:
+            self.mirrored += 1
+        return True
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                patients, primary, primary_seconds = self._queue.get(timeout=0.5)
+            except queue.Empty:
+                continue
+            try:
+                started = time.perf_counter()
+                # Same vectorized path the primary serves from (scale + one model call)
+                results = self.candidate.predict_matrix(self.candidate.scale_batch(patients), self.threshold)
+                shadow_seconds = time.perf_counter() - started
+                shadow = np.array([r['probabilities']['readmitted'] for r in results], dtype=float)
+                self._record(primary, shadow, primary_seconds, shadow_seconds)
+            except Exception as e:
+                with self._lock:
+                    self.failed += 1
+                    self.last_error = str(e)
+                print(f"⚠️ Shadow scoring failed: {e}")
+            finally:
+                self._queue.task_done()
+
+    def _record(self, primary, shadow, primary_seconds, shadow_seconds):
+        delta = shadow - primary
+        abs_delta = np.abs(delta)
+        primary_pos = primary >= self.threshold
+        shadow_pos = shadow >= self.threshold
+
+        with self._lock:
+            self.scored += 1
+            self.rows_scored += len(primary)
+            self.decision_agree += int((primary_pos == shadow_pos).sum())
+            self.band_agree += int((band_codes(primary, RISK_BANDS) == band_codes(shadow, RISK_BANDS)).sum())
+            self.primary_only_positive += int((primary_pos & ~shadow_pos).sum())
+            self.shadow_only_positive += int((shadow_pos & ~primary_pos).sum())
+            self.delta_sum += float(delta.sum())
+            self.abs_delta_sum += float(abs_delta.sum())
+            self.max_abs_delta = max(self.max_abs_delta, float(abs_delta.max(initial=0.0)))
+            self.delta_hist += np.bincount(np.searchsorted(DELTA_EDGES, abs_delta, side='right'),
+                                           minlength=len(DELTA_EDGES) + 1)
+            self.primary_seconds += primary_seconds
+            self.shadow_seconds += shadow_seconds
+            self.primary_latency.append(primary_seconds)
+            self.shadow_latency.append(shadow_seconds)
+
+    def status(self):
+        """Comparison metrics for the /shadow endpoint"""
+        def rate(count):
+            return round(count / self.rows_scored, 6) if self.rows_scored else None
+
+        def per_1k(seconds):
+            return round(seconds * 1000 / self.rows_scored * 1000, 3) if self.rows_scored else None
+
+        def percentile(samples, q):
+            return round(float(np.percentile(samples, q)) * 1000, 3) if samples else None
+
+        with self._lock:
+            labels = [f"<{DELTA_EDGES[0]}"] + [f"{lo}-{hi}" for lo, hi in zip(DELTA_EDGES, DELTA_EDGES[1:])] \
+                + [f">={DELTA_EDGES[-1]}"]
+            return {
+                'candidate_version': self.candidate.model_version,
+                'primary_version': self.primary_version,
+                'registered_at': self.registered_at,
+                'threshold': self.threshold,
+                'queue': {'depth': self._queue.qsize(), 'capacity': self._queue.maxsize,
+                          'workers': len(self._workers)},
+                'batches': {'mirrored': self.mirrored, 'scored': self.scored,
+                            'shed': self.shed, 'failed': self.failed},
+                'rows': {'scored': self.rows_scored, 'shed': self.rows_shed},
+                'agreement': {
+                    'decision': rate(self.decision_agree),
+                    'risk_band': rate(self.band_agree),
+                    'primary_only_positive': self.primary_only_positive,
+                    'shadow_only_positive': self.shadow_only_positive
+                },
+                'probability_delta': {
+                    'mean': rate(self.delta_sum),
+                    'mean_abs': rate(self.abs_delta_sum),
+                    'max_abs': round(self.max_abs_delta, 6),
+                    'histogram': dict(zip(labels, self.delta_hist.tolist()))
+                },
+                'latency': {
+                    'primary_ms_per_1k_rows': per_1k(self.primary_seconds),
+                    'shadow_ms_per_1k_rows': per_1k(self.shadow_seconds),
+                    'primary_batch_p50_ms': percentile(self.primary_latency, 50),
+                    'primary_batch_p95_ms': percentile(self.primary_latency, 95),
+                    'shadow_batch_p50_ms': percentile(self.shadow_latency, 50),
+                    'shadow_batch_p95_ms': percentile(self.shadow_latency, 95)
+                },
+                'last_error': self.last_error
+            }
+
+    def close(self, timeout=5.0):
+        """Stop the workers (queued batches that have not started are dropped)"""
+        self._stop.set()
+        for worker in self._workers:
+            worker.join(timeout)
@@ -6,9 +6,14 @@ Hospital Readmission Prediction API
 
 import os
 import sys
+import io
+import json
+import time
 import traceback
-from flask import Flask, request, jsonify
+from datetime import datetime
+from flask import Flask, Response, request, jsonify
 from flask_cors import CORS
+import numpy as np
 import pandas as pd
 import tempfile
 
@@ -18,6 +23,19 @@ sys.path.insert(0, backend_dir)
 
 try:
     from predict import HospitalReadmissionPredictor
+    from cohort import summarize_cohort
+    from rescoring import IncrementalRescorer
+    from prediction_store import PredictionStore
+    from columnar_export import PYARROW_AVAILABLE, ColumnarPredictionWriter
+    from what_if import sensitivity_table
+    from drift import FeatureDriftMonitor
+    from ingest import score_upload
+    from http_compression import init_compression
+    from profiling import init_profiling
+    from shadow import ShadowEvaluator
+    from vitals_stream import VitalsStream
+    from persistence import BulkHighRiskWriter, build_high_risk_records, sink_from_uri
+    from idempotency import IdempotencyConflict, IdempotencyStore, content_key
     print("✅ Successfully imported HospitalReadmissionPredictor")
 except ImportError as e:
     print(f"❌ Failed to import predictor: {e}")
@@ -29,19 +47,71 @@ CORS(app, resources={
     r"/*": {
         "origins": ["http://localhost:3000", "http://localhost:3001"],
         "methods": ["GET", "POST", "OPTIONS"],
-        "allow_headers": ["Content-Type"]
+        "allow_headers": ["Content-Type", "Content-Encoding", "Idempotency-Key", "X-Profile"]
     }
 })
 
+# ------------------- CONFIG -------------------
+RESCORE_DB_PATH = os.environ.get('MEDENGINE_RESCORE_DB', os.path.join(backend_dir, 'rescore_state.sqlite3'))
+PREDICTION_STORE_PATH = os.environ.get('MEDENGINE_PREDICTION_STORE', os.path.join(backend_dir, 'predictions.sqlite3'))
+# Sample of raw training feature rows (written by data.py); drift PSI falls back to the scaler without it
+DRIFT_REFERENCE_PATH = os.environ.get('MEDENGINE_DRIFT_REFERENCE', os.path.join(backend_dir, 'drift_reference.csv'))
+# Limit applies to the decompressed request body
+MAX_UPLOAD_BYTES = int(os.environ.get('MEDENGINE_MAX_UPLOAD_MB', 512)) * 1024 * 1024
+# sqlite:<path> | jsonl:<path> | firestore[:<project>] (set FIRESTORE_EMULATOR_HOST for the emulator)
+HIGH_RISK_SINK = os.environ.get('MEDENGINE_HIGH_RISK_SINK',
+                                'sqlite:' + os.path.join(backend_dir, 'high_risk_patients.sqlite3'))
+HIGH_RISK_BATCH_SIZE = int(os.environ.get('MEDENGINE_HIGH_RISK_BATCH_SIZE', 400))
+HIGH_RISK_WRITERS = int(os.environ.get('MEDENGINE_HIGH_RISK_WRITERS', 4))
+IDEMPOTENCY_DB_PATH = os.environ.get('MEDENGINE_IDEMPOTENCY_DB', os.path.join(backend_dir, 'idempotency.sqlite3'))
+IDEMPOTENCY_TTL_HOURS = float(os.environ.get('MEDENGINE_IDEMPOTENCY_TTL_HOURS', 24))
+# Bump when the /predict response format changes so stored responses are not replayed in the old shape
+PREDICT_RESPONSE_VERSION = 1
+# Opt-in float32 inference; verify first with `python compact_inference.py <csv>`
+COMPACT_INFERENCE = os.environ.get('MEDENGINE_COMPACT_INFERENCE', '').lower() in ('1', 'true', 'yes')
+# Candidate models for shadow evaluation are only loaded from this directory
+SHADOW_MODEL_DIR = os.environ.get('MEDENGINE_SHADOW_MODEL_DIR', backend_dir)
+SHADOW_MODEL = os.environ.get('MEDENGINE_SHADOW_MODEL')
+VITALS_WINDOW = int(os.environ.get('MEDENGINE_VITALS_WINDOW', 12))
+VITALS_MIN_READINGS = int(os.environ.get('MEDENGINE_VITALS_MIN_READINGS', 3))
+VITALS_MAX_PATIENTS = int(os.environ.get('MEDENGINE_VITALS_MAX_PATIENTS', 50000))
+# Per-signal overrides as JSON, e.g. '{"systolic": 20, "oxygenSaturation": 2}'
+VITALS_CHANGE_THRESHOLDS = json.loads(os.environ.get('MEDENGINE_VITALS_CHANGE_THRESHOLDS') or '{}')
+VITALS_STREAM_BATCH = 500
+# Several instances can run side by side as scoring workers (see coordinator.py)
+HOST = os.environ.get('MEDENGINE_HOST', '127.0.0.1')
+PORT = int(os.environ.get('MEDENGINE_PORT', 5001))
+
+# On-demand profiling (X-Profile: 1 or ?profile=1) is only available when a directory is configured
+PROFILE_DIR = os.environ.get('MEDENGINE_PROFILE_DIR')
+PROFILE_KEEP = int(os.environ.get('MEDENGINE_PROFILE_KEEP', 20))
+
+# Profiling hooks first so the profile also spans body decompression and response compression
+if PROFILE_DIR:
+    init_profiling(app, PROFILE_DIR, keep=PROFILE_KEEP)
+init_compression(app, MAX_UPLOAD_BYTES)
+
 # Global predictor instance
 predictor = None
+rescorer = None
+prediction_store = None
+drift_monitor = None
+high_risk_writer = None
+idempotency_store = None
+shadow_evaluator = None
+vitals_stream = None
+
+ENDPOINTS = ["/", "/health", "/predict", "/screen", "/cohort/summary", "/rescore",
+             "/predictions", "/predictions/latest/<patient_id>", "/what-if", "/drift",
+             "/high-risk/persist", "/shadow",
+             "/vitals", "/vitals/patients", "/vitals/stream", "/vitals/<patient_id>"]
 
 def initialize_predictor():
     """Initialize the ML predictor with proper error handling"""
     global predictor
     try:
         print("🏥 Initializing Hospital Readmission Predictor...")
-        predictor = HospitalReadmissionPredictor()
+        predictor = HospitalReadmissionPredictor(compact=COMPACT_INFERENCE)
         print("✅ Predictor initialized successfully!")
         return True
     except Exception as e:
@@ -49,6 +119,188 @@ def initialize_predictor():
         traceback.print_exc()
         return False
 
+def get_prediction_store():
+    """Open the local prediction store on first use"""
+    global prediction_store
+    if prediction_store is None:
+        prediction_store = PredictionStore(PREDICTION_STORE_PATH)
+    return prediction_store
+
+def request_patient_ids(patients, row_numbers=False):
+    """
+    Client patient ids for a JSON batch
+
+    Patients without a 'patient_id' get None, so the prediction store skips them:
+    a row number is not a patient. row_numbers=True fills in the 1-based row
+    number instead, for display-only uses such as cohort summaries.
+    """
+    return [
+        p.get('patient_id', i if row_numbers else None) if isinstance(p, dict) else (i if row_numbers else None)
+        for i, p in enumerate(patients, 1)
+    ]
+
+def record_predictions(results, patient_ids):
+    """Append scored results to the local store without failing the request"""
+    if predictor is None or not results:
+        return
+    try:
+        written = get_prediction_store().record(results, predictor.model_version, patient_ids)
+        print(f"💾 Stored {written} predictions")
+    except Exception as e:
+        print(f"⚠️ Failed to store predictions: {e}")
+
+def get_high_risk_writer():
+    """Open the high-risk sink and writer pool on first use"""
+    global high_risk_writer
+    if high_risk_writer is None:
+        high_risk_writer = BulkHighRiskWriter(sink_from_uri(HIGH_RISK_SINK),
+                                              batch_size=HIGH_RISK_BATCH_SIZE,
+                                              max_workers=HIGH_RISK_WRITERS)
+    return high_risk_writer
+
+def persist_high_risk(results, patients=None, uploaded_by='system'):
+    """Bulk-write High/Medium patients; returns the writer summary (or an error summary)"""
+    try:
+        records = build_high_risk_records(results, patients, uploaded_by)
+        return get_high_risk_writer().write(records)
+    except Exception as e:
+        print(f"⚠️ Failed to persist high-risk patients: {e}")
+        return {"written": 0, "error": str(e)}
+
+def is_replayable(payload):
+    """A response is only stored for replay if its high-risk write (when requested) fully succeeded"""
+    persisted = (payload or {}).get('persisted')
+    return not (isinstance(persisted, dict) and (persisted.get('failed') or persisted.get('error')))
+
+def get_idempotency_store():
+    """Open the idempotent response cache on first use"""
+    global idempotency_store
+    if idempotency_store is None:
+        idempotency_store = IdempotencyStore(IDEMPOTENCY_DB_PATH, ttl_seconds=IDEMPOTENCY_TTL_HOURS * 3600)
+    return idempotency_store
+
+def replay_version():
+    """Version stored responses are keyed on: the model and the response format"""
+    return f"{predictor.model_version}/r{PREDICT_RESPONSE_VERSION}"
+
+def request_idempotency_key():
+    """
+    Idempotency key and request fingerprint
+
+    Returns:
+        tuple: (client Idempotency-Key or a hash of the uploaded file / JSON body and options,
+                body fingerprint a client key is bound to - None for content keys)
+    """
+    options = sorted(request.args.items(multi=True)) + sorted(request.form.items(multi=True))
+    if 'file' in request.files:
+        file = request.files['file']
+        content = 'file:' + content_key(request.path, options, file.filename, file.stream)
+    else:
+        content = 'body:' + content_key(request.path, options, request.get_data(cache=True))
+
+    client_key = request.headers.get('Idempotency-Key')
+    if client_key:
+        return 'client:' + client_key, content
+    return content, None
+
+def shadow_model_path(name):
+    """Resolve a candidate file name inside SHADOW_MODEL_DIR (model files are pickles, so no other paths)"""
+    root = os.path.realpath(SHADOW_MODEL_DIR)
+    path = os.path.realpath(os.path.join(root, name))
+    if os.path.dirname(path) != root or not os.path.isfile(path):
+        raise ValueError(f"'{name}' is not a model file in the shadow model directory")
+    return path
+
+def register_shadow(model_file, scaler_file=None, threshold=0.4, max_queue=8, workers=1, compact=False):
+    """Load a candidate predictor and start mirroring traffic to it (replaces any current shadow)"""
+    global shadow_evaluator
+    # Check the pool bounds before unpickling a candidate model
+    ShadowEvaluator.check_limits(max_queue, workers)
+    candidate = HospitalReadmissionPredictor(
+        model_path=shadow_model_path(model_file),
+        scaler_path=shadow_model_path(scaler_file) if scaler_file else None,
+        surrogate_path='',
+        compact=compact
+    )
+    previous, shadow_evaluator = shadow_evaluator, ShadowEvaluator(
+        candidate, predictor.model_version, threshold=threshold, max_queue=max_queue, workers=workers
+    )
+    if previous is not None:
+        previous.close()
+    print(f"🕶️ Shadow model {candidate.model_version} registered against {predictor.model_version}")
+    return shadow_evaluator
+
+def mirror_to_shadow(patients, predictions, seconds):
+    """Hand a scored batch to the shadow evaluator (no-op without a shadow; never blocks)"""
+    shadow = shadow_evaluator
+    if shadow is None:
+        return
+    try:
+        ok = [i for i, r in enumerate(predictions) if 'error' not in r]
+        rows = patients.iloc[ok] if isinstance(patients, pd.DataFrame) else [patients[i] for i in ok]
+        probabilities = [predictions[i]['probabilities']['readmitted'] for i in ok]
+        if ok and not shadow.submit(rows, probabilities, seconds):
+            print(f"⚠️ Shadow queue full; shed a batch of {len(ok)} rows")
+    except Exception as e:
+        print(f"⚠️ Failed to mirror batch to shadow: {e}")
+
+def get_vitals_stream():
+    """Create the per-patient vitals windows on first use"""
+    global vitals_stream
+    if vitals_stream is None:
+        vitals_stream = VitalsStream(predictor, window=VITALS_WINDOW, min_readings=VITALS_MIN_READINGS,
+                                     change_thresholds=VITALS_CHANGE_THRESHOLDS,
+                                     max_patients=VITALS_MAX_PATIENTS)
+    return vitals_stream
+
+def iter_vitals_batches():
+    """Vitals events from a JSON {'events': [...]} body or a streamed NDJSON body, in micro-batches"""
+    if request.mimetype in ('application/x-ndjson', 'application/jsonl'):
+        batch = []
+        for line in request.stream:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                batch.append(json.loads(line))
+            except ValueError:
+                batch.append(None)  # counted as rejected by the stream
+            if len(batch) >= VITALS_STREAM_BATCH:
+                yield batch
+                batch = []
+        if batch:
+            yield batch
+        return
+
+    data = request.get_json(silent=True)
+    if not data or not isinstance(data.get('events'), list):
+        raise ValueError("Expected JSON with 'events' array or an application/x-ndjson body")
+    for start in range(0, len(data['events']), VITALS_STREAM_BATCH):
+        yield data['events'][start:start + VITALS_STREAM_BATCH]
+
+def load_drift_reference():
+    """Training rows used for drift PSI buckets, or None when not available"""
+    if not os.path.isfile(DRIFT_REFERENCE_PATH):
+        return None
+    try:
+        return pd.read_csv(DRIFT_REFERENCE_PATH)
+    except Exception as e:
+        print(f"⚠️ Could not load drift reference '{DRIFT_REFERENCE_PATH}': {e}")
+        return None
+
+def observe_drift(patients):
+    """Fold a request batch into the drift monitor without failing the request"""
+    global drift_monitor
+    if predictor is None:
+        return
+    try:
+        if drift_monitor is None:
+            drift_monitor = FeatureDriftMonitor(predictor.scaler, predictor.feature_names,
+                                                reference=load_drift_reference())
+        drift_monitor.update(patients)
+    except Exception as e:
+        print(f"⚠️ Drift monitor update failed: {e}")
+
 # ------------------- ROUTES -------------------
 
 @app.route('/')
@@ -68,12 +320,13 @@ def health():
         "status": "healthy",
         "predictor_loaded": predictor is not None,
         "features_count": 44 if predictor else 0,
-        "endpoints": ["/", "/health", "/predict"]
+        "compact_inference": bool(predictor and predictor.compact),
+        "endpoints": ENDPOINTS
     })
 
 @app.route('/predict', methods=['POST', 'OPTIONS'])
 def predict_patients():
-    """Predict readmission for patients"""
+    """Predict readmission for patients (repeated submissions replay the stored result)"""
     
     # Handle preflight OPTIONS request
     if request.method == 'OPTIONS':
@@ -85,8 +338,81 @@ def predict_patients():
             "error": "ML predictor not initialized",
             "message": "Please restart the server"
         }), 500
-    
+
+    key = fingerprint = None
     try:
+        key, fingerprint = request_idempotency_key()
+        stored = get_idempotency_store().get(key, replay_version(), fingerprint)
+        if stored is not None:
+            print("🔁 Replaying stored result for repeated submission")
+            response = Response(stored, mimetype='application/json')
+            response.headers['Idempotent-Replayed'] = 'true'
+            return response
+    except IdempotencyConflict as e:
+        return jsonify({
+            "success": False,
+            "error": str(e),
+            "message": "Use a new Idempotency-Key for a different request"
+        }), 422
+    except Exception as e:
+        print(f"⚠️ Idempotency lookup failed: {e}")
+
+    response = app.make_response(score_prediction_request())
+    # A failed sink write must be retried by the client, not replayed back to it
+    if key is not None and response.status_code == 200 and response.is_json and \
+            is_replayable(response.get_json(silent=True)):
+        try:
+            get_idempotency_store().put(key, replay_version(), response.get_data(), fingerprint)
+        except Exception as e:
+            print(f"⚠️ Failed to store idempotent response: {e}")
+    return response
+
+def score_prediction_request():
+    """Score the /predict request body (file upload or JSON patients)"""
+    try:
+        # File upload: CSV or Excel (xlsx), streamed and scored in row blocks
+        if 'file' in request.files:
+            file = request.files['file']
+            if file.filename == '':
+                return jsonify({
+                    "success": False,
+                    "error": "No file selected",
+                    "message": "Expected a CSV or .xlsx file upload"
+                }), 400
+
+            # Each block is mirrored to the shadow model as soon as it is scored, so the file
+            # is never held in memory again for the shadow
+            try:
+                predictions = score_upload(
+                    predictor, file,
+                    threshold=float(request.form.get('threshold', 0.4)),
+                    block_size=int(request.form.get('block_size', 5000)),
+                    sheet=request.form.get('sheet'),
+                    on_block=observe_drift,
+                    on_scored=mirror_to_shadow
+                )
+            except ValueError as e:
+                return jsonify({
+                    "success": False,
+                    "error": str(e),
+                    "message": "Invalid upload"
+                }), 400
+            print(f"✅ Generated {len(predictions)} predictions from '{file.filename}'")
+            # Only rows that carry the hospital's own id are stored; row numbers are not patients
+            record_predictions(predictions, [r.get('source_patient_id') for r in predictions])
+
+            response = {
+                "success": True,
+                "predictions": predictions,
+                "message": f"Successfully processed {len(predictions)} patients"
+            }
+            if request.form.get('persist', '').lower() in ('1', 'true', 'yes'):
+                sources = [{'patient_id': r['source_patient_id']} if 'source_patient_id' in r else {}
+                           for r in predictions]
+                response["persisted"] = persist_high_risk(predictions, sources,
+                                                          request.form.get('uploaded_by', 'system'))
+            return jsonify(response)
+
         # Get JSON data
         data = request.get_json()
         if not data or 'patients' not in data:
@@ -105,16 +431,86 @@ def predict_patients():
             }), 400
         
         print(f"📊 Processing {len(patients)} patients...")
-        
-        # Predict using the patients list directly
-        predictions = predictor.predict_batch(patients)
+        observe_drift(patients)
+
+        # Top-K / probability-floor mode: full payloads only for selected patients
+        if data.get('top_k') is not None or data.get('min_probability') is not None:
+            top_k = data.get('top_k')
+            min_probability = data.get('min_probability')
+            try:
+                selection = predictor.predict_top_risk(
+                    patients,
+                    threshold=float(data.get('threshold', 0.4)),
+                    min_probability=float(min_probability) if min_probability is not None else None,
+                    top_k=int(top_k) if top_k is not None else None,
+                    include_rest=bool(data.get('include_rest', True)),
+                    explain_top_n=int(data.get('explain_top_n', 3)) if data.get('explain') else 0
+                )
+            except (TypeError, ValueError) as e:
+                return jsonify({
+                    "success": False,
+                    "error": str(e),
+                    "message": "Invalid top_k / min_probability selection"
+                }), 400
+            print(f"✅ Selected {len(selection['selected'])} of {selection['total']} patients")
+            request_ids = request_patient_ids(patients)
+            record_predictions(selection['selected'],
+                               [request_ids[r['patient_id'] - 1] for r in selection['selected']])
+
+            return jsonify({
+                "success": True,
+                "predictions": selection['selected'],
+                "others": selection['others'],
+                "errors": selection['errors'],
+                "total_patients": selection['total'],
+                "message": f"Selected {len(selection['selected'])} of {selection['total']} patients"
+            })
+
+        # Columnar response (?format=parquet|arrow): probability/decision/risk-band arrays
+        output_format = request.args.get('format')
+        if output_format in ('parquet', 'arrow'):
+            if not PYARROW_AVAILABLE:
+                return jsonify({
+                    "success": False,
+                    "error": "pyarrow not installed",
+                    "message": "Columnar output is unavailable on this server"
+                }), 501
+
+            threshold = float(data.get('threshold', 0.4))
+            buffer = io.BytesIO()
+            writer = ColumnarPredictionWriter(buffer, fmt=output_format, threshold=threshold)
+            for start, probabilities, default_preds in predictor.iter_score_chunks(pd.DataFrame(patients)):
+                writer.write_chunk(np.arange(start, start + len(probabilities)) + 1,
+                                   probabilities, default_preds)
+            writer.close()
+            print(f"✅ Generated {writer.rows_written} columnar predictions ({output_format})")
+
+            mimetype = 'application/vnd.apache.parquet' if output_format == 'parquet' \
+                else 'application/vnd.apache.arrow.file'
+            return Response(buffer.getvalue(), mimetype=mimetype)
+
+        # Predict using the patients list directly (vectorized with risk drivers if requested)
+        started = time.perf_counter()
+        if data.get('explain'):
+            predictions = predictor.predict_explained(
+                patients,
+                threshold=float(data.get('threshold', 0.4)),
+                top_n=int(data.get('explain_top_n', 3))
+            )
+        else:
+            predictions = predictor.predict_batch(patients)
         print(f"✅ Generated {len(predictions)} predictions")
-        
-        return jsonify({
+        mirror_to_shadow(patients, predictions, time.perf_counter() - started)
+        record_predictions(predictions, request_patient_ids(patients))
+
+        response = {
             "success": True,
             "predictions": predictions,
             "message": f"Successfully processed {len(predictions)} patients"
-        })
+        }
+        if data.get('persist'):
+            response["persisted"] = persist_high_risk(predictions, patients, data.get('uploaded_by', 'system'))
+        return jsonify(response)
         
     except Exception as e:
         print(f"❌ Prediction error: {e}")
@@ -125,12 +521,554 @@ def predict_patients():
             "message": "Internal server error during prediction"
         }), 500
 
+@app.route('/screen', methods=['POST', 'OPTIONS'])
+def screen_patients():
+    """Fast population screening: surrogate first pass, exact ensemble near the threshold"""
+
+    if request.method == 'OPTIONS':
+        return '', 204
+
+    if predictor is None:
+        return jsonify({
+            "success": False,
+            "error": "ML predictor not initialized",
+            "message": "Please restart the server"
+        }), 500
+
+    try:
+        data = request.get_json()
+        if not data or not isinstance(data.get('patients'), list) or len(data['patients']) == 0:
+            return jsonify({
+                "success": False,
+                "error": "Invalid request format",
+                "message": "Expected JSON with non-empty 'patients' array"
+            }), 400
+
+        threshold = float(data.get('threshold', 0.4))
+        probabilities, exact_mask = predictor.screen_batch(data['patients'], threshold)
+
+        return jsonify({
+            "success": True,
+            "probabilities": [round(float(p), 4) for p in probabilities],
+            "predictions": (probabilities >= threshold).astype(int).tolist(),
+            "exact_scored": int(exact_mask.sum()),
+            "surrogate_enabled": predictor.surrogate is not None,
+            "surrogate_report": predictor.surrogate.report if predictor.surrogate else None,
+            "message": f"Screened {len(probabilities)} patients ({int(exact_mask.sum())} exact)"
+        })
+
+    except Exception as e:
+        print(f"❌ Screening error: {e}")
+        traceback.print_exc()
+        return jsonify({
+            "success": False,
+            "error": str(e),
+            "message": "Internal server error during screening"
+        }), 500
+
+@app.route('/cohort/summary', methods=['POST', 'OPTIONS'])
+def cohort_summary():
+    """
+    Aggregate a scored cohort into band counts, histogram, percentiles and top-K.
+    Accepts either {"probabilities": [...], "patient_ids": [...]} or {"patients": [...]}
+    """
+
+    if request.method == 'OPTIONS':
+        return '', 204
+
+    try:
+        data = request.get_json() or {}
+        top_k = int(data.get('top_k', 10))
+        bins = int(data.get('bins', 10))
+
+        if 'probabilities' in data:
+            probabilities = data['probabilities']
+            patient_ids = data.get('patient_ids')
+        elif isinstance(data.get('patients'), list) and data['patients']:
+            if predictor is None:
+                return jsonify({
+                    "success": False,
+                    "error": "ML predictor not initialized",
+                    "message": "Please restart the server"
+                }), 500
+            probabilities = predictor.predict_proba_batch(data['patients'])
+            patient_ids = request_patient_ids(data['patients'], row_numbers=True)
+        else:
+            return jsonify({
+                "success": False,
+                "error": "Invalid request format",
+                "message": "Expected JSON with 'probabilities' or non-empty 'patients' array"
+            }), 400
+
+        return jsonify({
+            "success": True,
+            "summary": summarize_cohort(probabilities, patient_ids, top_k=top_k, bins=bins)
+        })
+
+    except ValueError as e:
+        return jsonify({
+            "success": False,
+            "error": str(e),
+            "message": "Invalid cohort data"
+        }), 400
+    except Exception as e:
+        print(f"❌ Cohort summary error: {e}")
+        traceback.print_exc()
+        return jsonify({
+            "success": False,
+            "error": str(e),
+            "message": "Internal server error during aggregation"
+        }), 500
+
+@app.route('/rescore', methods=['POST', 'OPTIONS'])
+def rescore_patients():
+    """
+    Incremental rescoring: only new/changed patients go through the model.
+    Expects {"patients": [{"patient_id": ..., <features>}], "mode": "delta" | "full"}
+    """
+    global rescorer
+
+    if request.method == 'OPTIONS':
+        return '', 204
+
+    if predictor is None:
+        return jsonify({
+            "success": False,
+            "error": "ML predictor not initialized",
+            "message": "Please restart the server"
+        }), 500
+
+    try:
+        data = request.get_json()
+        if not data or not isinstance(data.get('patients'), list) or len(data['patients']) == 0:
+            return jsonify({
+                "success": False,
+                "error": "Invalid request format",
+                "message": "Expected JSON with non-empty 'patients' array"
+            }), 400
+
+        if rescorer is None:
+            rescorer = IncrementalRescorer(predictor, RESCORE_DB_PATH)
+        observe_drift(data['patients'])
+
+        outcome = rescorer.rescore(data['patients'], mode=data.get('mode', 'delta'))
+        print(f"✅ Rescored {outcome['scored']} changed patients ({outcome['unchanged']} unchanged)")
+        record_predictions(outcome['rescored'], [r['patient_id'] for r in outcome['rescored']])
+
+        return jsonify({
+            "success": True,
+            "predictions": outcome['results'],
+            "scored": outcome['scored'],
+            "unchanged": outcome['unchanged'],
+            "removed": outcome['removed'],
+            "model_version": outcome['model_version'],
+            "message": f"Rescored {outcome['scored']} of {outcome['scored'] + outcome['unchanged']} patients"
+        })
+
+    except ValueError as e:
+        return jsonify({
+            "success": False,
+            "error": str(e),
+            "message": "Invalid rescoring request"
+        }), 400
+    except Exception as e:
+        print(f"❌ Rescoring error: {e}")
+        traceback.print_exc()
+        return jsonify({
+            "success": False,
+            "error": str(e),
+            "message": "Internal server error during rescoring"
+        }), 500
+
+@app.route('/predictions/latest/<patient_id>')
+def latest_prediction(patient_id):
+    """Latest stored score for one patient"""
+    latest = get_prediction_store().latest(patient_id)
+    if latest is None:
+        return jsonify({
+            "success": False,
+            "error": "No stored prediction",
+            "message": f"Patient '{patient_id}' has not been scored"
+        }), 404
+
+    return jsonify({
+        "success": True,
+        "prediction": latest,
+        "history": get_prediction_store().history(patient_id, limit=int(request.args.get('history', 0)))
+    })
+
+@app.route('/predictions')
+def query_predictions():
+    """
+    Indexed query over stored scores, e.g. /predictions?min_probability=0.7&today=1
+    Filters: min_probability, since, until (ISO dates/timestamps), today, model_version, limit
+    """
+    try:
+        since = request.args.get('since')
+        if request.args.get('today') in ('1', 'true'):
+            since = datetime.now().date().isoformat()
+
+        min_probability = request.args.get('min_probability')
+        rows = get_prediction_store().query(
+            min_probability=float(min_probability) if min_probability is not None else None,
+            since=since,
+            until=request.args.get('until'),
+            model_version=request.args.get('model_version'),
+            limit=int(request.args.get('limit', 1000))
+        )
+        return jsonify({
+            "success": True,
+            "predictions": rows,
+            "count": len(rows)
+        })
+
+    except ValueError as e:
+        return jsonify({
+            "success": False,
+            "error": str(e),
+            "message": "Invalid query parameters"
+        }), 400
+
+@app.route('/what-if', methods=['POST', 'OPTIONS'])
+def what_if():
+    """
+    Batched sensitivity scoring for one patient.
+    Expects {"patient": {...}, "perturbations": [{"quantity": "time_in_hospital", "deltas": [-2, 0]}]}
+    """
+
+    if request.method == 'OPTIONS':
+        return '', 204
+
+    if predictor is None:
+        return jsonify({
+            "success": False,
+            "error": "ML predictor not initialized",
+            "message": "Please restart the server"
+        }), 500
+
+    try:
+        data = request.get_json()
+        if not data or not isinstance(data.get('patient'), dict) or not isinstance(data.get('perturbations'), list):
+            return jsonify({
+                "success": False,
+                "error": "Invalid request format",
+                "message": "Expected JSON with 'patient' object and 'perturbations' array"
+            }), 400
+
+        table = sensitivity_table(predictor, data['patient'], data['perturbations'],
+                                  threshold=float(data.get('threshold', 0.4)))
+        print(f"✅ Scored {len(table['variants'])} what-if variants")
+
+        return jsonify({
+            "success": True,
+            "sensitivity": table,
+            "message": f"Scored {len(table['variants'])} variants in one batch"
+        })
+
+    except ValueError as e:
+        return jsonify({
+            "success": False,
+            "error": str(e),
+            "message": "Invalid perturbation grid"
+        }), 400
+    except Exception as e:
+        print(f"❌ What-if error: {e}")
+        traceback.print_exc()
+        return jsonify({
+            "success": False,
+            "error": str(e),
+            "message": "Internal server error during what-if scoring"
+        }), 500
+
+@app.route('/drift', methods=['GET'])
+def drift_status():
+    """Live feature drift vs. the scaler's training statistics"""
+    if drift_monitor is None:
+        return jsonify({
+            "success": True,
+            "drift": None,
+            "message": "No prediction traffic observed yet"
+        })
+
+    return jsonify({
+        "success": True,
+        "drift": drift_monitor.status()
+    })
+
+@app.route('/drift/reset', methods=['POST'])
+def drift_reset():
+    """Start a fresh drift observation window"""
+    if drift_monitor is not None:
+        drift_monitor.reset()
+    return jsonify({
+        "success": True,
+        "message": "Drift statistics reset"
+    })
+
+@app.route('/shadow', methods=['GET'])
+def shadow_status():
+    """Agreement, probability deltas and latency of the shadow model vs. the primary"""
+    if shadow_evaluator is None:
+        return jsonify({
+            "success": True,
+            "shadow": None,
+            "message": "No shadow model registered"
+        })
+
+    return jsonify({
+        "success": True,
+        "shadow": shadow_evaluator.status()
+    })
+
+@app.route('/shadow/register', methods=['POST', 'OPTIONS'])
+def shadow_register():
+    """Register a candidate model (file in MEDENGINE_SHADOW_MODEL_DIR) to score mirrored traffic"""
+    if request.method == 'OPTIONS':
+        return '', 204
+
+    if predictor is None:
+        return jsonify({
+            "success": False,
+            "error": "ML predictor not initialized",
+            "message": "Please restart the server"
+        }), 500
+
+    data = request.get_json(silent=True) or {}
+    if not data.get('model_file'):
+        return jsonify({
+            "success": False,
+            "error": "Invalid request format",
+            "message": "Expected JSON with 'model_file'"
+        }), 400
+
+    try:
+        shadow = register_shadow(
+            data['model_file'],
+            scaler_file=data.get('scaler_file'),
+            threshold=float(data.get('threshold', 0.4)),
+            max_queue=int(data.get('max_queue', 8)),
+            workers=int(data.get('workers', 1)),
+            compact=bool(data.get('compact', False))
+        )
+        return jsonify({
+            "success": True,
+            "shadow": shadow.status(),
+            "message": f"Shadow model {shadow.candidate.model_version} registered"
+        })
+    except ValueError as e:
+        return jsonify({
+            "success": False,
+            "error": str(e),
+            "message": "Invalid shadow model"
+        }), 400
+    except Exception as e:
+        print(f"❌ Shadow registration error: {e}")
+        traceback.print_exc()
+        return jsonify({
+            "success": False,
+            "error": str(e),
+            "message": "Failed to load shadow model"
+        }), 500
+
+@app.route('/shadow/stop', methods=['POST'])
+def shadow_stop():
+    """Stop mirroring traffic and return the final comparison"""
+    global shadow_evaluator
+    shadow, shadow_evaluator = shadow_evaluator, None
+    if shadow is None:
+        return jsonify({
+            "success": True,
+            "shadow": None,
+            "message": "No shadow model registered"
+        })
+
+    shadow.close()
+    return jsonify({
+        "success": True,
+        "shadow": shadow.status(),
+        "message": "Shadow evaluation stopped"
+    })
+
+@app.route('/vitals', methods=['GET'])
+def vitals_status():
+    """Vitals stream counters and trigger thresholds"""
+    if vitals_stream is None:
+        return jsonify({
+            "success": True,
+            "vitals": None,
+            "message": "No vitals received yet"
+        })
+
+    return jsonify({
+        "success": True,
+        "vitals": vitals_stream.status()
+    })
+
+@app.route('/vitals/patients', methods=['POST', 'OPTIONS'])
+def vitals_register_patients():
+    """Register encounter features used when vitals trigger a patient's re-score"""
+    if request.method == 'OPTIONS':
+        return '', 204
+
+    if predictor is None:
+        return jsonify({
+            "success": False,
+            "error": "ML predictor not initialized",
+            "message": "Please restart the server"
+        }), 500
+
+    data = request.get_json(silent=True)
+    if not data or not isinstance(data.get('patients'), list):
+        return jsonify({
+            "success": False,
+            "error": "Invalid request format",
+            "message": "Expected JSON with 'patients' array (each with 'patient_id' and model features)"
+        }), 400
+
+    # Bad patients are reported one by one; the rest are still registered
+    errors, candidates = {}, []
+    for i, patient in enumerate(data['patients']):
+        if not isinstance(patient, dict):
+            errors[i] = "Each patient must be a JSON object"
+        elif patient.get('patient_id') is None:
+            errors[i] = "Each patient needs 'patient_id'"
+        else:
+            candidates.append(i)
+    stream = get_vitals_stream()
+    rejected = stream.register_patients([(data['patients'][i]['patient_id'], data['patients'][i])
+                                         for i in candidates])
+    errors.update({candidates[j]: error for j, error in rejected.items()})
+    registered = len(data['patients']) - len(errors)
+
+    response = {
+        "success": registered > 0 or not errors,
+        "registered": registered,
+        "errors": [
+            {
+                "index": i,
+                "patient_id": data['patients'][i].get('patient_id') if isinstance(data['patients'][i], dict) else None,
+                "error": error
+            }
+            for i, error in sorted(errors.items())
+        ],
+        "message": f"Registered {registered} patients for vitals-triggered scoring"
+                   + (f", rejected {len(errors)}" if errors else "")
+    }
+    if not response["success"]:
+        response["error"] = "Invalid patient features"
+        return jsonify(response), 400
+    return jsonify(response)
+
+@app.route('/vitals/stream', methods=['POST', 'OPTIONS'])
+def vitals_ingest():
+    """Ingest vitals events; patients whose windowed vitals moved enough are re-scored"""
+    if request.method == 'OPTIONS':
+        return '', 204
+
+    if predictor is None:
+        return jsonify({
+            "success": False,
+            "error": "ML predictor not initialized",
+            "message": "Please restart the server"
+        }), 500
+
+    try:
+        stream = get_vitals_stream()
+        accepted, rejected, errors, rescored = 0, 0, [], []
+        for batch in iter_vitals_batches():
+            outcome = stream.ingest(batch)
+            accepted += outcome['accepted']
+            rejected += outcome['rejected']
+            errors.extend(outcome['errors'])
+            rescored.extend(outcome['rescored'])
+            # Cached entries repeat an already recorded prediction
+            fresh = [entry for entry in outcome['rescored'] if not entry['cached']]
+            record_predictions([entry['result'] for entry in fresh], [entry['patient_id'] for entry in fresh])
+
+        return jsonify({
+            "success": True,
+            "accepted": accepted,
+            "rejected": rejected,
+            "errors": errors[:10],
+            "rescored": rescored,
+            "message": f"Ingested {accepted} readings, re-scored {len(rescored)} patients"
+        })
+    except ValueError as e:
+        return jsonify({
+            "success": False,
+            "error": str(e),
+            "message": "Invalid vitals payload"
+        }), 400
+    except Exception as e:
+        print(f"❌ Vitals ingestion error: {e}")
+        traceback.print_exc()
+        return jsonify({
+            "success": False,
+            "error": str(e),
+            "message": "Internal server error during vitals ingestion"
+        }), 500
+
+@app.route('/vitals/<patient_id>', methods=['GET'])
+def vitals_patient(patient_id):
+    """Rolling vitals window and latest vitals-triggered score for one patient"""
+    summary = vitals_stream.patient(patient_id) if vitals_stream is not None else None
+    if summary is None:
+        return jsonify({
+            "success": False,
+            "error": "Patient not found",
+            "message": f"No vitals received for patient '{patient_id}'"
+        }), 404
+
+    return jsonify({
+        "success": True,
+        "vitals": summary
+    })
+
+@app.route('/high-risk/persist', methods=['POST', 'OPTIONS'])
+def high_risk_persist():
+    """Bulk-save High/Medium patients from already-scored predictions"""
+    if request.method == 'OPTIONS':
+        return '', 204
+
+    data = request.get_json(silent=True)
+    if not data or not isinstance(data.get('predictions'), list):
+        return jsonify({
+            "success": False,
+            "error": "Invalid request format",
+            "message": "Expected JSON with 'predictions' array (and optional aligned 'patients')"
+        }), 400
+
+    patients = data.get('patients')
+    if patients is not None and len(patients) != len(data['predictions']):
+        return jsonify({
+            "success": False,
+            "error": "Invalid patients data",
+            "message": "'patients' must align with 'predictions'"
+        }), 400
+
+    try:
+        records = build_high_risk_records(data['predictions'], patients, data.get('uploaded_by', 'system'))
+        summary = get_high_risk_writer().write(records)
+        return jsonify({
+            "success": summary['failed'] == 0,
+            "persisted": summary,
+            "message": f"Saved {summary['written']} of {len(records)} high-risk patients"
+        })
+    except Exception as e:
+        print(f"❌ High-risk persistence error: {e}")
+        traceback.print_exc()
+        return jsonify({
+            "success": False,
+            "error": str(e),
+            "message": "Failed to persist high-risk patients"
+        }), 500
+
 @app.errorhandler(404)
 def not_found(error):
     return jsonify({
         "success": False,
         "error": "Endpoint not found",
-        "available_endpoints": ["/", "/health", "/predict"]
+        "available_endpoints": ENDPOINTS
     }), 404
 
 @app.errorhandler(500)
@@ -149,14 +1087,20 @@ if __name__ == '__main__':
     if not initialize_predictor():
         print("❌ Failed to initialize predictor. Exiting...")
         sys.exit(1)
+
+    if SHADOW_MODEL:
+        try:
+            register_shadow(SHADOW_MODEL)
+        except Exception as e:
+            print(f"⚠️ Failed to register shadow model '{SHADOW_MODEL}': {e}")
     
     # Start Flask app
     try:
-        print("🌐 Starting Flask server on http://127.0.0.1:5001")
+        print(f"🌐 Starting Flask server on http://{HOST}:{PORT}")
         app.run(
             debug=True, 
-            port=5001, 
-            host='127.0.0.1',
+            port=PORT, 
+            host=HOST,
             use_reloader=False  # Prevent double initialization in debug mode
         )
     except Exception as e:
@@ -0,0 +1,204 @@
+"""
+Surrogate Screener for the Bagging SVM ensemble
+Nystroem kernel approximation + ridge regression trained to reproduce the
+ensemble's readmission probabilities at a fraction of the inference cost.
+
+Usage (offline fit + agreement report):
+    python surrogate.py synthetic_dataset_sample.csv --synthetic 20000
+"""
+
+import argparse
+import json
+import os
+import sys
+
+import joblib
+import numpy as np
+from sklearn.kernel_approximation import Nystroem
+from sklearn.linear_model import Ridge
+from sklearn.pipeline import make_pipeline
+
+EPS = 1e-6
+
+
+def _logit(p):
+    p = np.clip(p, EPS, 1 - EPS)
+    return np.log(p / (1 - p))
+
+
+def ensemble_gamma(model, n_features):
+    """Average RBF gamma across the bagged SVC estimators (falls back to 1/n_features)"""
+    gammas = [getattr(est, '_gamma', None) for est in getattr(model, 'estimators_', [])
+              if getattr(est, 'kernel', None) == 'rbf']
+    gammas = [g for g in gammas if g is not None]
+    return float(np.mean(gammas)) if gammas else 1.0 / n_features
+
+
+class SurrogateScreener:
+    """
+    Linear model over random kernel features that mimics the ensemble
+
+    The error band is chosen on a calibration split: any surrogate score further
+    than `band` from the decision threshold agreed with the exact ensemble on
+    every calibration row, so only the remaining rows need exact scoring. The
+    agreement report comes from a separate split and covers the screened
+    pipeline (surrogate outside the band, ensemble inside it), not just the
+    raw surrogate.
+    """
+
+    def __init__(self, n_components=300, gamma=None, alpha=1.0, random_state=0):
+        self.n_components = n_components
+        self.gamma = gamma
+        self.alpha = alpha
+        self.random_state = random_state
+        self.pipeline = None
+        self.band = 0.0
+        self.report = {}
+
+    def fit(self, X_scaled, exact_probs):
+        """Fit surrogate on scaled features against the ensemble's probabilities"""
+        n_components = min(self.n_components, len(X_scaled))
+        self.pipeline = make_pipeline(
+            Nystroem(kernel='rbf', gamma=self.gamma, n_components=n_components,
+                     random_state=self.random_state),
+            Ridge(alpha=self.alpha)
+        )
+        self.pipeline.fit(X_scaled, _logit(exact_probs))
+        return self
+
+    def predict_proba(self, X_scaled):
+        """Approximate readmission probabilities"""
+        return 1.0 / (1.0 + np.exp(-self.pipeline.predict(X_scaled)))
+
+    def calibrate_band(self, X_scaled, exact_probs, threshold=0.4):
+        """
+        Set the screening band from calibration rows
+
+        Band = largest distance from the threshold of a row whose decision flipped,
+        or the 99.9th percentile error if nothing flipped.
+        """
+        approx = self.predict_proba(X_scaled)
+        agree = (approx >= threshold) == (exact_probs >= threshold)
+        if (~agree).any():
+            self.band = float(np.abs(approx[~agree] - threshold).max() + EPS)
+        else:
+            self.band = float(np.quantile(np.abs(approx - exact_probs), 0.999))
+        return self.band
+
+    def agreement_report(self, X_scaled, exact_probs, threshold=0.4):
+        """
+        Compare the surrogate and the screened pipeline against exact probabilities
+
+        Rows must not have been used to fit the surrogate or to pick the band.
+
+        Returns:
+            dict: Raw surrogate error / agreement, plus the screened pipeline's decision
+                  agreement and the share of rows it sends to exact scoring
+        """
+        approx = self.predict_proba(X_scaled)
+        abs_err = np.abs(approx - exact_probs)
+        exact_decisions = exact_probs >= threshold
+        agree = (approx >= threshold) == exact_decisions
+
+        # What screen_batch would return: rows inside the band get the exact probability
+        within_band = np.abs(approx - threshold) <= self.band
+        screened = np.where(within_band, exact_probs, approx)
+        screened_agree = (screened >= threshold) == exact_decisions
+
+        self.report = {
+            'rows': int(len(X_scaled)),
+            'threshold': threshold,
+            'mean_abs_error': round(float(abs_err.mean()), 6),
+            'p99_abs_error': round(float(np.quantile(abs_err, 0.99)), 6),
+            'max_abs_error': round(float(abs_err.max()), 6),
+            'decision_agreement': round(float(agree.mean()), 6),
+            'band': round(self.band, 6),
+            'exact_fraction': round(float(within_band.mean()), 6),
+            'screened_decision_agreement': round(float(screened_agree.mean()), 6),
+            'screened_decision_flips': int((~screened_agree).sum())
+        }
+        return self.report
+
+    def save(self, path):
+        joblib.dump(self, path)
+
+    @staticmethod
+    def load(path):
+        return joblib.load(path)
+
+
+def build_surrogate(predictor, X_scaled, threshold=0.4, holdout=0.2, calibration=0.2, random_state=0, **kwargs):
+    """
+    Fit a surrogate for `predictor`, pick its band and measure it on separate splits
+
+    Args:
+        predictor (HospitalReadmissionPredictor): Loaded exact predictor
+        X_scaled (np.ndarray): Calibration rows in scaled feature space
+        threshold (float): Decision threshold the band is measured against
+        holdout (float): Fraction of rows kept for the agreement report
+        calibration (float): Fraction of rows used only to pick the band
+
+    Returns:
+        SurrogateScreener: Fitted screener with `band` and `report` populated
+    """
+    exact = predictor.model.predict_proba(X_scaled)[:, 1]
+
+    rng = np.random.default_rng(random_state)
+    order = rng.permutation(len(X_scaled))
+    n_test = max(1, int(len(X_scaled) * holdout))
+    n_calib = max(1, int(len(X_scaled) * calibration))
+    test_idx, calib_idx, train_idx = np.split(order, [n_test, n_test + n_calib])
+
+    kwargs.setdefault('gamma', ensemble_gamma(predictor.model, X_scaled.shape[1]))
+    screener = SurrogateScreener(random_state=random_state, **kwargs)
+    screener.fit(X_scaled[train_idx], exact[train_idx])
+    screener.calibrate_band(X_scaled[calib_idx], exact[calib_idx], threshold)
+    screener.agreement_report(X_scaled[test_idx], exact[test_idx], threshold)
+    screener.report['calibration_rows'] = int(len(calib_idx))
+    return screener
+
+
+# =============================================================================
+# OFFLINE FIT
+# =============================================================================
+
+if __name__ == "__main__":
+    sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+    import pandas as pd
+    from predict import HospitalReadmissionPredictor
+    from compact_inference import synthetic_training_rows
+    from surrogate import build_surrogate  # pickle under the importable module name
+
+    parser = argparse.ArgumentParser(description="Fit surrogate screener and write agreement report")
+    parser.add_argument('csv_files', nargs='*', help="CSV files with the 44 model features")
+    parser.add_argument('--synthetic', type=int, default=0,
+                        help="Extra calibration rows drawn from the scaler's training distribution")
+    parser.add_argument('--threshold', type=float, default=0.4)
+    parser.add_argument('--components', type=int, default=300)
+    parser.add_argument('--out', default=os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                                      'surrogate_screener.pkl'))
+    args = parser.parse_args()
+
+    predictor = HospitalReadmissionPredictor(surrogate_path='')
+
+    blocks = [predictor.scale_batch(pd.read_csv(path)) for path in args.csv_files]
+    if args.synthetic:
+        # Same generator as compact_inference: 0/1 columns stay valid flags
+        blocks.append(predictor.scale_batch(
+            synthetic_training_rows(predictor.scaler, args.synthetic, predictor.feature_names)
+        ))
+    if not blocks:
+        parser.error("Provide at least one CSV file or --synthetic N")
+
+    X = np.vstack(blocks)
+    print(f"📊 Calibrating surrogate on {len(X)} rows...")
+    screener = build_surrogate(predictor, X, threshold=args.threshold, n_components=args.components)
+    screener.save(args.out)
+
+    report_path = os.path.splitext(args.out)[0] + '_report.json'
+    with open(report_path, 'w') as f:
+        json.dump(screener.report, f, indent=2)
+
+    print(f"✅ Surrogate saved to '{args.out}'")
+    print(f"📋 Agreement report ({report_path}):")
+    print(json.dumps(screener.report, indent=2))
@@ -0,0 +1,196 @@
+"""
+Sharded scoring coordinator tests against stub /predict workers on localhost:
+failed shards are retried on healthy workers, a worker that keeps failing is
+taken out of rotation, and results are merged in input order.
+
+Run: python -m pytest -q test_coordinator.py
+"""
+
+import gzip
+import io
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pandas as pd
+import pytest
+
+from coordinator import MAX_WORKER_FAILURES, ShardCoordinator, worker_state_env
+
+ROWS = 1000
+SHARD_SIZE = 100
+
+
+class StubWorker:
+    """
+    Minimal /predict worker: scores each row as row / ROWS so output order can be checked
+
+    Args:
+        fail_first (int): Requests answered with a 500 before the worker starts succeeding
+        always_fail (bool): Answer every request with a 500
+        delay (float): Seconds to wait before answering (reorders shard completion)
+        truncate_first (int): Requests answered with a body cut short, as from a worker dying mid-response
+        bad_rows (set): Input rows answered with a per-row error result
+    """
+
+    def __init__(self, fail_first=0, always_fail=False, delay=0.0, truncate_first=0, bad_rows=()):
+        self.bad_rows = set(bad_rows)
+        self.fail_first = fail_first
+        self.truncate_first = truncate_first
+        self.always_fail = always_fail
+        self.delay = delay
+        self.requests = 0
+        self.lock = threading.Lock()
+
+        worker = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                body = gzip.decompress(self.rfile.read(int(self.headers['Content-Length'])))
+                with worker.lock:
+                    worker.requests += 1
+                    fail = worker.always_fail or worker.requests <= worker.fail_first
+                    truncate = worker.requests <= worker.truncate_first
+                time.sleep(worker.delay)
+                if fail:
+                    self.reply(500, {'success': False, 'error': 'stub failure'})
+                    return
+                csv = body.split(b'Content-Type: text/csv\r\n\r\n', 1)[1].rsplit(b'\r\n--', 1)[0]
+                rows = pd.read_csv(io.BytesIO(csv))['row']
+                predictions = [
+                    {'error': 'Prediction error: Non-numeric or missing feature values', 'patient_id': i + 1}
+                    if r in worker.bad_rows else stub_prediction(r)
+                    for i, r in enumerate(rows)
+                ]
+                self.reply(200, {'success': True, 'predictions': predictions}, truncate)
+
+            def reply(self, status, payload, truncate=False):
+                data = json.dumps(payload).encode()
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(data)))
+                self.end_headers()
+                if truncate:
+                    self.wfile.write(data[:len(data) // 2])
+                    self.close_connection = True
+                    return
+                self.wfile.write(data)
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self.url = f'http://127.0.0.1:{self.server.server_address[1]}'
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+def stub_prediction(row):
+    probability = row / ROWS
+    return {
+        'probabilities': {'not_readmitted': 1 - probability, 'readmitted': probability},
+        'predictions': {'default_threshold_0.5': {'prediction': int(probability >= 0.5)}},
+        'risk_assessment': {'risk_level': 'HIGH RISK' if probability >= 0.7 else 'LOW RISK'}
+    }
+
+
+@pytest.fixture
+def workers():
+    started = []
+
+    def start(**kwargs):
+        worker = StubWorker(**kwargs)
+        started.append(worker)
+        return worker
+
+    yield start
+    for worker in started:
+        worker.close()
+
+
+@pytest.fixture
+def input_csv(tmp_path):
+    path = tmp_path / 'backfill.csv'
+    pd.DataFrame({'row': range(ROWS), 'age_encoded': 1}).to_csv(path, index=False)
+    return str(path)
+
+
+def assert_ordered_output(report, path):
+    out = pd.read_csv(path)
+    assert report['rows'] == ROWS
+    assert out['patient_id'].tolist() == list(range(1, ROWS + 1))
+    assert out['readmitted'].tolist() == [row / ROWS for row in range(ROWS)]
+
+
+def test_failed_shards_are_retried_and_merged_in_order(workers, input_csv, tmp_path):
+    flaky = workers(fail_first=2)
+    slow = workers(delay=0.05)
+    output = str(tmp_path / 'out.csv')
+
+    report = ShardCoordinator([flaky.url, slow.url], shard_size=SHARD_SIZE).run(input_csv, output)
+
+    assert_ordered_output(report, output)
+    assert report['shards'] == ROWS // SHARD_SIZE
+    assert report['retries'] == 2
+    assert report['workers'][flaky.url]['failures'] == 2
+    assert report['workers'][flaky.url]['healthy']
+
+
+def test_truncated_response_is_retried_not_hung(workers, input_csv, tmp_path):
+    # http.client.IncompleteRead is not a URLError / OSError; it must still fail the shard
+    dying = workers(truncate_first=1)
+    output = str(tmp_path / 'out.csv')
+    result = {}
+
+    def run():
+        result['report'] = ShardCoordinator([dying.url], shard_size=SHARD_SIZE, timeout=5).run(input_csv, output)
+
+    thread = threading.Thread(target=run, daemon=True)
+    thread.start()
+    thread.join(timeout=30)
+    assert not thread.is_alive(), "coordinator hung after a truncated worker response"
+
+    assert_ordered_output(result['report'], output)
+    assert result['report']['retries'] == 1
+    assert result['report']['workers'][dying.url]['failures'] == 1
+
+
+def test_failing_worker_is_taken_out_of_rotation(workers, input_csv, tmp_path):
+    broken = workers(always_fail=True)
+    # Slow enough that the run outlasts the broken worker's retry backoff
+    healthy = workers(delay=0.3)
+    output = str(tmp_path / 'out.csv')
+
+    report = ShardCoordinator([broken.url, healthy.url], shard_size=SHARD_SIZE).run(input_csv, output)
+
+    assert_ordered_output(report, output)
+    assert not report['workers'][broken.url]['healthy']
+    assert report['workers'][broken.url]['failures'] == MAX_WORKER_FAILURES
+    assert broken.requests == MAX_WORKER_FAILURES
+    assert report['workers'][healthy.url]['rows'] == ROWS
+
+
+def test_run_aborts_when_every_worker_fails(workers, input_csv, tmp_path):
+    broken = workers(always_fail=True)
+    with pytest.raises(RuntimeError):
+        ShardCoordinator([broken.url], shard_size=SHARD_SIZE, max_attempts=5).run(input_csv, str(tmp_path / 'out.csv'))
+
+
+def test_unscoreable_rows_abort_without_retry(workers, input_csv, tmp_path):
+    worker = workers(bad_rows={250})
+    with pytest.raises(RuntimeError, match='input row 251'):
+        ShardCoordinator([worker.url], shard_size=SHARD_SIZE).run(input_csv, str(tmp_path / 'out.csv'))
+
+
+def test_spawned_workers_get_separate_state(monkeypatch, tmp_path):
+    monkeypatch.delenv('MEDENGINE_HIGH_RISK_SINK', raising=False)
+    first, second = worker_state_env(5101, str(tmp_path)), worker_state_env(5102, str(tmp_path))
+    assert set(first) == set(second)
+    assert all(first[name] != second[name] for name in first)
+
+    monkeypatch.setenv('MEDENGINE_HIGH_RISK_SINK', 'firestore:highRiskPatients')
+    assert 'MEDENGINE_HIGH_RISK_SINK' not in worker_state_env(5101, str(tmp_path))
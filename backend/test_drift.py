@@ -0,0 +1,81 @@
+"""
+Drift monitor tests against the shipped scaler: in-distribution traffic, including
+discrete features such as age_encoded, must not be flagged, while shifted traffic is.
+
+Run: python -m pytest -q test_drift.py
+"""
+
+import os
+
+import joblib
+import numpy as np
+import pandas as pd
+import pytest
+
+from drift import FeatureDriftMonitor
+
+SCALER_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'scaler.pkl')
+
+
+@pytest.fixture(scope='module')
+def scaler():
+    return joblib.load(SCALER_PATH)
+
+
+def training_like(scaler, n, seed=0):
+    """Rows drawn from the scaler's training statistics; age_encoded is an integer code"""
+    rng = np.random.default_rng(seed)
+    monitor = FeatureDriftMonitor(scaler, scaler.feature_names_in_)
+    mean, std = monitor.train_mean, monitor.train_std
+    X = rng.standard_normal((n, len(mean))) * std + mean
+    X[:, monitor.is_binary] = (rng.random((n, monitor.is_binary.sum())) < mean[monitor.is_binary]).astype(float)
+    df = pd.DataFrame(X, columns=scaler.feature_names_in_)
+    df['age_encoded'] = df['age_encoded'].round()
+    return df
+
+
+def feed(monitor, df, batch=500):
+    for start in range(0, len(df), batch):
+        monitor.update(df.iloc[start:start + batch])
+    return monitor.status()
+
+
+def feature(status, name):
+    return next(f for f in status['features'] if f['feature'] == name)
+
+
+def test_in_distribution_traffic_raises_no_drift(scaler):
+    status = feed(FeatureDriftMonitor(scaler, scaler.feature_names_in_), training_like(scaler, 5000))
+    assert status['drifting_features'] == []
+    age = feature(status, 'age_encoded')
+    assert age['type'] == 'categorical'
+    assert age['psi'] is None
+
+
+def test_shifted_traffic_is_flagged(scaler):
+    df = training_like(scaler, 5000, seed=1)
+    monitor = FeatureDriftMonitor(scaler, scaler.feature_names_in_)
+    df['age_encoded'] = (df['age_encoded'] + 2 * monitor.train_std[0]).round()
+    df['n_lab_procedures_capped'] += 1.5 * monitor.train_std[4]
+
+    status = feed(monitor, df)
+    assert {'age_encoded', 'n_lab_procedures_capped'} <= set(status['drifting_features'])
+    assert feature(status, 'n_lab_procedures_capped')['type'] == 'continuous'
+
+
+def test_reference_sample_gives_psi_for_discrete_features(scaler):
+    reference = training_like(scaler, 20000, seed=2)
+    monitor = FeatureDriftMonitor(scaler, scaler.feature_names_in_, reference=reference)
+    status = feed(monitor, training_like(scaler, 5000, seed=3))
+    assert status['drifting_features'] == []
+    assert feature(status, 'age_encoded')['psi'] < 0.05
+
+    # Same mean, different shape: only the reference buckets can see this
+    df = training_like(scaler, 5000, seed=4)
+    mean, std = monitor.train_mean[0], monitor.train_std[0]
+    df['age_encoded'] = np.where(np.arange(len(df)) % 2, np.round(mean - std), np.round(mean + std))
+    monitor = FeatureDriftMonitor(scaler, scaler.feature_names_in_, reference=reference)
+    status = feed(monitor, df)
+    age = feature(status, 'age_encoded')
+    assert abs(age['mean_shift_sd']) < monitor.mean_shift_threshold
+    assert age['drifting'] and age['psi'] > monitor.psi_threshold
@@ -0,0 +1,127 @@
+"""
+Compressed request body tests: decompression bombs must be rejected with a 413
+while memory stays bounded, and normal compressed bodies must round-trip.
+
+Run: python -m pytest -q test_http_compression.py
+"""
+
+import gzip
+import json
+import tracemalloc
+import zlib
+
+import pytest
+from flask import Flask, jsonify, request
+
+from http_compression import ZSTD_AVAILABLE, init_compression
+
+MAX_SIZE = 8 * 1024 * 1024
+BOMB_SIZE = 1024 ** 3
+# Far below the 1 GB the bombs inflate to
+MEMORY_BUDGET = 64 * 1024 * 1024
+
+if ZSTD_AVAILABLE:
+    import zstandard
+
+
+@pytest.fixture
+def client():
+    app = Flask(__name__)
+    init_compression(app, MAX_SIZE)
+
+    @app.route('/echo', methods=['POST'])
+    def echo():
+        return jsonify(size=len(request.get_data()), json=request.get_json(silent=True))
+
+    return app.test_client()
+
+
+def _zeros(total, chunk=1024 * 1024):
+    block = b'\0' * chunk
+    for _ in range(total // chunk):
+        yield block
+
+
+def gzip_bomb(total=BOMB_SIZE):
+    compressor = zlib.compressobj(9, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+    return b''.join(compressor.compress(block) for block in _zeros(total)) + compressor.flush()
+
+
+def zstd_bomb(total=BOMB_SIZE):
+    compressor = zstandard.ZstdCompressor(level=3).compressobj()
+    return b''.join(compressor.compress(block) for block in _zeros(total)) + compressor.flush()
+
+
+def post_bomb(client, body, encoding):
+    tracemalloc.start()
+    try:
+        response = client.post('/echo', data=body, headers={
+            'Content-Encoding': encoding, 'Content-Type': 'application/octet-stream'
+        })
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+    return response, peak
+
+
+def test_gzip_bomb_rejected_with_bounded_memory(client):
+    response, peak = post_bomb(client, gzip_bomb(), 'gzip')
+    assert response.status_code == 413
+    assert peak < MEMORY_BUDGET
+
+
+@pytest.mark.skipif(not ZSTD_AVAILABLE, reason="zstandard not installed")
+def test_zstd_bomb_rejected_with_bounded_memory(client):
+    body = zstd_bomb()
+    assert len(body) < 64 * 1024
+    response, peak = post_bomb(client, body, 'zstd')
+    assert response.status_code == 413
+    assert peak < MEMORY_BUDGET
+
+
+@pytest.mark.skipif(not ZSTD_AVAILABLE, reason="zstandard not installed")
+def test_body_inflating_just_past_limit_is_not_truncated(client):
+    # Werkzeug stops reading at the limit; the body must not be accepted cut short
+    body = zstandard.ZstdCompressor().compress(b'\0' * (MAX_SIZE + 1))
+    response = client.post('/echo', data=body, headers={
+        'Content-Encoding': 'zstd', 'Content-Type': 'application/octet-stream'
+    })
+    assert response.status_code == 413
+
+
+@pytest.mark.parametrize('encoding', ['gzip', 'deflate', 'zstd'])
+def test_compressed_json_round_trip(client, encoding):
+    if encoding == 'zstd' and not ZSTD_AVAILABLE:
+        pytest.skip("zstandard not installed")
+    payload = {'patients': [{'patient_id': i, 'age_encoded': i % 5} for i in range(2000)]}
+    raw = json.dumps(payload).encode()
+    if encoding == 'gzip':
+        body = gzip.compress(raw)
+    elif encoding == 'deflate':
+        body = zlib.compress(raw)
+    else:
+        # Two frames back to back, as a streaming client may send
+        cctx = zstandard.ZstdCompressor()
+        body = cctx.compress(raw[:len(raw) // 2]) + cctx.compress(raw[len(raw) // 2:])
+
+    response = client.post('/echo', data=body, headers={
+        'Content-Encoding': encoding, 'Content-Type': 'application/json'
+    })
+    assert response.status_code == 200
+    assert response.json['size'] == len(raw)
+    assert response.json['json'] == payload
+
+
+def test_exact_limit_body_accepted(client):
+    raw = b'\0' * MAX_SIZE
+    response = client.post('/echo', data=gzip.compress(raw), headers={
+        'Content-Encoding': 'gzip', 'Content-Type': 'application/octet-stream'
+    })
+    assert response.status_code == 200
+    assert response.json['size'] == MAX_SIZE
+
+
+def test_invalid_body_and_unknown_encoding(client):
+    headers = {'Content-Type': 'application/json'}
+    assert client.post('/echo', data=b'not gzip', headers={**headers, 'Content-Encoding': 'gzip'}).status_code == 415
+    assert client.post('/echo', data=b'xx', headers={**headers, 'Content-Encoding': 'br'}).status_code == 415
@@ -0,0 +1,330 @@
+"""
+Streaming Vitals Aggregation
+Keeps a rolling window of recent vitals per patient in a fixed-size ring
+buffer (O(1) update per reading via running sums) and re-scores a patient only
+when a windowed signal moves past its change threshold since the last score,
+or crosses into a different clinical status band.
+
+The readmission model has no vitals features: vitals decide *when* a patient
+is re-scored, and the score itself uses the encounter features registered for
+that patient (register_patient), so updated encounter data is picked up as
+soon as the vitals warrant a fresh look. When the registered features have not
+changed since the last score, the model output cannot change either, so the
+cached result is returned with the new trigger reasons instead of re-predicting.
+
+Event fields follow the upload-vitals form (src/lib/firestore/vitals.ts):
+    {"patientId": "P001", "systolic": 142, "diastolic": 91, "heartRate": 104,
+     "temperature": 99.8, "respiratoryRate": 20, "oxygenSaturation": 95}
+"""
+
+import copy
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+
+SIGNALS = ('systolic', 'diastolic', 'heartRate', 'temperature', 'respiratoryRate', 'oxygenSaturation')
+
+# Windowed-mean change (absolute units) that triggers a re-score
+DEFAULT_CHANGE_THRESHOLDS = {
+    'systolic': 15.0,
+    'diastolic': 10.0,
+    'heartRate': 15.0,
+    'temperature': 1.0,
+    'respiratoryRate': 4.0,
+    'oxygenSaturation': 3.0
+}
+
+# (low below, high at/above) - same cut-offs as the status helpers in vitals.ts,
+# where heart rate and temperature are 'high' only strictly above 100 / 99.5
+STATUS_RANGES = {
+    'systolic': (90.0, 140.0),
+    'diastolic': (60.0, 90.0),
+    'heartRate': (60.0, np.nextafter(100.0, np.inf)),
+    'temperature': (97.0, np.nextafter(99.5, np.inf))
+}
+
+
+def _status(signal, value):
+    if signal not in STATUS_RANGES or np.isnan(value):
+        return None
+    low, high = STATUS_RANGES[signal]
+    return 'low' if value < low else 'high' if value >= high else 'normal'
+
+
+class VitalsWindow:
+    """Fixed-size ring buffer of readings with running per-signal sums and counts"""
+
+    __slots__ = ('values', 'pos', 'filled', 'sums', 'counts', 'baseline', 'last_reading_at')
+
+    def __init__(self, size):
+        self.values = np.full((size, len(SIGNALS)), np.nan, dtype=np.float32)
+        self.pos = 0
+        self.filled = 0
+        self.sums = np.zeros(len(SIGNALS))
+        self.counts = np.zeros(len(SIGNALS), dtype=np.int32)
+        self.baseline = None
+        self.last_reading_at = None
+
+    def push(self, reading, timestamp):
+        """Replace the oldest reading: O(1) in the window size"""
+        old = self.values[self.pos]
+        old_seen = ~np.isnan(old)
+        self.sums[old_seen] -= old[old_seen]
+        self.counts[old_seen] -= 1
+
+        new_seen = ~np.isnan(reading)
+        self.sums[new_seen] += reading[new_seen]
+        self.counts[new_seen] += 1
+        self.values[self.pos] = reading
+
+        self.pos = (self.pos + 1) % len(self.values)
+        self.filled = min(self.filled + 1, len(self.values))
+        self.last_reading_at = timestamp
+        if self.pos == 0:
+            # Once per lap, rebuild the sums so float round-off cannot accumulate
+            self.sums = np.nansum(self.values, axis=0, dtype=np.float64)
+
+    def means(self):
+        with np.errstate(invalid='ignore', divide='ignore'):
+            return np.where(self.counts > 0, self.sums / np.maximum(self.counts, 1), np.nan)
+
+
+class VitalsStream:
+    """
+    Per-patient vitals windows plus change-triggered risk re-scoring
+
+    Args:
+        predictor (HospitalReadmissionPredictor): Loaded predictor
+        window (int): Readings kept per patient
+        min_readings (int): Readings required before a patient is first scored
+        change_thresholds (dict): Per-signal windowed-mean change that triggers a re-score
+        threshold (float): Custom decision threshold for re-scored results
+        max_patients (int): Windows and registered patients kept in memory (least recently
+            updated are evicted)
+    """
+
+    def __init__(self, predictor, window=12, min_readings=3, change_thresholds=None, threshold=0.4,
+                 max_patients=50000):
+        self.predictor = predictor
+        self.window = window
+        self.min_readings = min_readings
+        self.threshold = threshold
+        self.max_patients = max_patients
+        unknown = set(change_thresholds or {}) - set(SIGNALS)
+        if unknown:
+            raise ValueError(f"Unknown vitals signals in change thresholds: {sorted(unknown)}")
+        thresholds = dict(DEFAULT_CHANGE_THRESHOLDS, **(change_thresholds or {}))
+        self.change_thresholds = np.array([thresholds[s] for s in SIGNALS], dtype=float)
+        if not (self.change_thresholds > 0).all():
+            raise ValueError("Vitals change thresholds must be positive numbers")
+
+        self._lock = threading.Lock()
+        self._windows = OrderedDict()
+        # patient_id -> (feature key, scaled row, version); the version only moves when the features change
+        self._features = OrderedDict()
+        self._latest = {}
+        self._next_version = 0
+        self.readings_seen = 0
+        self.rescored = 0
+        self.cache_hits = 0
+
+    def register_patients(self, patients):
+        """
+        Set (or update) the encounter features used when these patients are re-scored
+
+        Features are validated and scaled here, so a bad patient is rejected at
+        registration instead of failing every vitals batch that triggers them.
+
+        Args:
+            patients (list): (patient_id, feature dict) pairs
+
+        Returns:
+            dict: {index into patients: error message} for rejected patients
+        """
+        patients = list(patients)
+        X_scaled, valid, errors = self.predictor._scale_valid([features for _, features in patients])
+        with self._lock:
+            for row, i in zip(X_scaled, valid):
+                patient_id = str(patients[i][0])
+                key = tuple(row.tolist())
+                current = self._features.get(patient_id)
+                if current is None or current[0] != key:
+                    self._next_version += 1
+                    self._features[patient_id] = (key, row, self._next_version)
+                self._features.move_to_end(patient_id)
+                if len(self._features) > self.max_patients:
+                    evicted, _ = self._features.popitem(last=False)
+                    self._latest.pop(evicted, None)
+        return errors
+
+    def register_patient(self, patient_id, features):
+        """Set (or update) the encounter features for one patient (ValueError if they cannot be scored)"""
+        errors = self.register_patients([(patient_id, features)])
+        if errors:
+            raise ValueError(f"Patient {patient_id}: {errors[0]}")
+
+    def _parse(self, event):
+        if not isinstance(event, dict):
+            raise ValueError("Vitals event must be a JSON object")
+        patient_id = event.get('patientId', event.get('patient_id'))
+        if patient_id is None:
+            raise ValueError("Vitals event needs 'patientId'")
+        reading = np.array([
+            float(event[s]) if event.get(s) not in (None, '') else np.nan for s in SIGNALS
+        ], dtype=np.float32)
+        if np.isnan(reading).all():
+            raise ValueError(f"Vitals event for {patient_id} has no readings")
+        return str(patient_id), reading
+
+    def _check_trigger(self, window, baseline):
+        """Reasons to re-score this patient now against baseline (empty list = no re-score)"""
+        if window.filled < self.min_readings:
+            return []
+        means = window.means()
+        if baseline is None:
+            return ['initial window']
+
+        reasons = []
+        shift = np.abs(means - baseline)
+        for i in np.flatnonzero(np.nan_to_num(shift) >= self.change_thresholds):
+            reasons.append(f"{SIGNALS[i]} {baseline[i]:.1f} -> {means[i]:.1f}")
+        for i, signal in enumerate(SIGNALS):
+            before, after = _status(signal, baseline[i]), _status(signal, means[i])
+            if before and after and before != after:
+                reasons.append(f"{signal} {before} -> {after}")
+        return reasons
+
+    def ingest(self, events):
+        """
+        Fold vitals events into the windows and re-score triggered patients in one batch
+
+        Patients whose registered features are unchanged since their last score reuse
+        that result (marked 'cached') rather than going through the model again.
+
+        Returns:
+            dict: accepted / rejected counts, and one entry per re-scored patient with its
+                  result, trigger reasons and window summary
+        """
+        rejected, triggered, baselines = [], {}, {}
+        now = time.time()
+
+        with self._lock:
+            for event in events:
+                try:
+                    patient_id, reading = self._parse(event)
+                except (ValueError, TypeError) as e:
+                    rejected.append(str(e))
+                    continue
+
+                window = self._windows.get(patient_id)
+                if window is None:
+                    window = self._windows[patient_id] = VitalsWindow(self.window)
+                    if len(self._windows) > self.max_patients:
+                        evicted, _ = self._windows.popitem(last=False)
+                        self._latest.pop(evicted, None)
+                        self._features.pop(evicted, None)
+                else:
+                    self._windows.move_to_end(patient_id)
+                window.push(reading, event.get('measurementTime', now))
+                self.readings_seen += 1
+
+                if patient_id in self._features:
+                    # Compare against this batch's pending reference point, so the same shift
+                    # does not re-trigger on every reading
+                    pending = baselines.get(patient_id)
+                    reasons = self._check_trigger(window, pending[1] if pending else window.baseline)
+                    if reasons:
+                        triggered.setdefault(patient_id, []).extend(reasons)
+                        baselines[patient_id] = (window, window.means())
+
+            # Only patients whose features moved since their last score need the model
+            cached, to_score = {}, []
+            for patient_id in list(triggered):
+                if patient_id not in self._features:
+                    # Evicted later in this same batch
+                    del triggered[patient_id]
+                    continue
+                _, row, version = self._features[patient_id]
+                latest = self._latest.get(patient_id)
+                if latest is not None and latest['features_version'] == version:
+                    cached[patient_id] = (latest['result'], version)
+                else:
+                    to_score.append((patient_id, row, version))
+
+        # Rows were validated and scaled at registration, so one bad patient cannot fail the batch
+        results = {}
+        if to_score:
+            scored = self.predictor.predict_matrix(np.vstack([row for _, row, _ in to_score]), self.threshold)
+            for (patient_id, _, version), result in zip(to_score, scored):
+                result['patient_id'] = patient_id
+                results[patient_id] = (result, version, False)
+
+        rescored = []
+        if triggered:
+            with self._lock:
+                for patient_id, reasons in triggered.items():
+                    if patient_id in cached:
+                        result, version = cached[patient_id]
+                        result, is_cached = copy.deepcopy(result), True
+                    else:
+                        result, version, is_cached = results[patient_id]
+                    entry = {
+                        'patient_id': patient_id,
+                        'reasons': reasons,
+                        'result': result,
+                        'cached': is_cached,
+                        'features_version': version,
+                        'window': self._summary(patient_id) if patient_id in self._windows else None
+                    }
+                    self._latest[patient_id] = entry
+                    rescored.append(entry)
+                    # The reference point only moves once a result for it is stored
+                    window, means = baselines[patient_id]
+                    window.baseline = means
+                self.rescored += len(rescored)
+                self.cache_hits += len(cached)
+
+        return {
+            'accepted': len(events) - len(rejected),
+            'rejected': len(rejected),
+            'errors': rejected[:10],
+            'rescored': rescored
+        }
+
+    def _summary(self, patient_id):
+        window = self._windows[patient_id]
+        means = window.means()
+        return {
+            'readings': int(window.filled),
+            'last_reading_at': window.last_reading_at,
+            'means': {s: (round(float(m), 2) if not np.isnan(m) else None) for s, m in zip(SIGNALS, means)},
+            'status': {s: _status(s, means[i]) for i, s in enumerate(SIGNALS) if s in STATUS_RANGES}
+        }
+
+    def patient(self, patient_id):
+        """Current window summary and latest vitals-triggered score for one patient"""
+        patient_id = str(patient_id)
+        with self._lock:
+            if patient_id not in self._windows:
+                return None
+            return {
+                'patient_id': patient_id,
+                'registered': patient_id in self._features,
+                'window': self._summary(patient_id),
+                'latest': self._latest.get(patient_id)
+            }
+
+    def status(self):
+        with self._lock:
+            return {
+                'patients': len(self._windows),
+                'registered_patients': len(self._features),
+                'readings_seen': self.readings_seen,
+                'rescored': self.rescored,
+                'cache_hits': self.cache_hits,
+                'window': self.window,
+                'min_readings': self.min_readings,
+                'change_thresholds': dict(zip(SIGNALS, self.change_thresholds.tolist()))
+            }
@@ -0,0 +1,248 @@
+"""
+What-If / Sensitivity Scoring
+Expands a base patient and a grid of feature perturbations into one matrix so
+every variant is scored in a single model call.
+
+Perturbation spec (one entry per grid axis):
+    {"quantity": "time_in_hospital", "deltas": [-2, -1, 0]}   # raw days; every encoding recomputed
+    {"quantity": "medications", "values": [5, 15]}            # set the raw count
+    {"features": ["change"], "values": [0, 1]}                # standalone model columns only
+
+Several model columns are encodings of one clinical quantity (log, z-scaled,
+binned), so a raw delta added to all of them does not describe a real patient.
+Those go through CLINICAL_QUANTITIES; column patterns that touch a multi-column
+group (derived encodings or one-hot categories) are rejected.
+"""
+
+import itertools
+from fnmatch import fnmatch
+
+import numpy as np
+import pandas as pd
+
+from attribution import FEATURE_GROUPS
+from cohort import risk_label
+
+MAX_VARIANTS = 10000
+
+
+def _z(mean, std, transform=None):
+    return lambda raw: ((transform(raw) if transform else raw) - mean) / std
+
+
+# Raw clinical quantities (keyed like attribution.FEATURE_GROUPS) and how the model
+# encodes them. The *_scaled columns are z-scores of the log / capped column; the
+# constants come from the training preprocessing and reproduce the encoded sample
+# data (synthetic_dataset_sample.csv) exactly.
+#
+# Bin one-hots are (inclusive upper bound, columns) in ascending order and cover every
+# value. The training cut-offs are not in this repo: the sample pins procedures 0 / 1-2 / 6
+# and medications <=10 / 12-21 / >=32 to their bins, and each edge sits halfway through
+# the gap between two observed bins (a value exactly halfway goes to the lower bin).
+CLINICAL_QUANTITIES = {
+    'time_in_hospital': {
+        'unit': 'days',
+        'min': 1,
+        'source': ('time_in_hospital_log', np.expm1),
+        'encode': {
+            'time_in_hospital_log': np.log1p,
+            'time_in_hospital_scaled': _z(1.55361413, 0.53546446, np.log1p)
+        }
+    },
+    'lab_procedures': {
+        'unit': 'lab procedures',
+        'min': 0,
+        'source': ('n_lab_procedures_capped', None),
+        'encode': {
+            'n_lab_procedures_capped': None,
+            'n_lab_procedures_scaled': _z(43.18495999, 19.68488227)
+        }
+    },
+    'procedures': {
+        'unit': 'procedures',
+        'min': 0,
+        'source': ('n_procedures_log', np.expm1),
+        'encode': {
+            'n_procedures_log': np.log1p,
+            'n_procedures_log_scaled': _z(0.62652757, 0.65618847, np.log1p)
+        },
+        'bins': [
+            (0, {'n_procedures_binned_Low': 0}),
+            (4, {'n_procedures_binned_Low': 1}),
+            (np.inf, {'n_procedures_binned_Low': 0})
+        ]
+    },
+    'medications': {
+        'unit': 'medications',
+        'min': 0,
+        'source': ('n_medications_log', np.expm1),
+        'encode': {
+            'n_medications_log': np.log1p,
+            'n_medications_scaled': _z(2.74074909, 0.47790268, np.log1p)
+        },
+        'bins': [
+            (11, {'n_medications_binned_Low': 1, 'n_medications_binned_Medium': 0}),
+            (26, {'n_medications_binned_Low': 0, 'n_medications_binned_Medium': 1}),
+            (np.inf, {'n_medications_binned_Low': 0, 'n_medications_binned_Medium': 0})
+        ]
+    }
+}
+
+
+def _quantity_columns(name, raw, index):
+    """Encoded column values for raw quantity values (one row per raw value)"""
+    quantity = CLINICAL_QUANTITIES[name]
+    columns = {}
+    for col, transform in quantity['encode'].items():
+        columns[index[col]] = transform(raw) if transform else raw
+
+    bins = quantity.get('bins')
+    if bins:
+        # Bin i holds values above bin i-1's upper bound up to its own
+        which = np.searchsorted([upper for upper, _ in bins], raw, side='left')
+        for i, (_, one_hot) in enumerate(bins):
+            inside = which == i
+            for col, value in one_hot.items():
+                columns.setdefault(index[col], np.zeros(len(raw)))[inside] = value
+    return columns
+
+
+def _parse_axes(perturbations, feature_names, base_patient):
+    """Resolve each perturbation spec to (label, column values per option, options)"""
+    index = {name: i for i, name in enumerate(feature_names)}
+    group_of = {col: group for group, cols in FEATURE_GROUPS.items() if len(cols) > 1 for col in cols}
+
+    axes = []
+    for spec in perturbations:
+        if not isinstance(spec, dict):
+            raise ValueError("Each perturbation must be a JSON object")
+        if ('deltas' in spec) == ('values' in spec):
+            raise ValueError("Each perturbation needs exactly one of 'deltas' or 'values'")
+        mode = 'deltas' if 'deltas' in spec else 'values'
+        options = np.asarray(spec[mode], dtype=float)
+        if options.ndim != 1 or len(options) == 0:
+            raise ValueError(f"'{mode}' must be a non-empty list of numbers")
+
+        if 'quantity' in spec:
+            name = spec['quantity']
+            if not isinstance(name, str) or name not in CLINICAL_QUANTITIES:
+                raise ValueError(f"Unknown quantity '{name}' (one of {list(CLINICAL_QUANTITIES)})")
+            quantity = CLINICAL_QUANTITIES[name]
+            source_col, inverse = quantity['source']
+            base_value = float(base_patient[source_col])
+            base_raw = float(np.round(inverse(base_value) if inverse else base_value))
+            raw = base_raw + options if mode == 'deltas' else options
+            if (raw < quantity['min']).any():
+                raise ValueError(f"{name} cannot go below {quantity['min']} {quantity['unit']}")
+            columns = _quantity_columns(name, raw, index)
+            axes.append({
+                'label': name,
+                'features': [feature_names[i] for i in sorted(columns)],
+                'columns': columns,
+                'mode': mode,
+                'options': options,
+                'base_value': base_raw
+            })
+            continue
+
+        patterns = spec.get('features')
+        if isinstance(patterns, str):
+            patterns = [patterns]
+        if not patterns:
+            raise ValueError("Each perturbation needs 'quantity' or 'features'")
+        if not isinstance(patterns, list) or not all(isinstance(pat, str) for pat in patterns):
+            raise ValueError("'features' must be a feature name pattern or a list of them")
+
+        cols = [i for i, name in enumerate(feature_names) if any(fnmatch(name, pat) for pat in patterns)]
+        if not cols:
+            raise ValueError(f"No model features match {patterns}")
+        grouped = sorted({group_of[feature_names[i]] for i in cols if feature_names[i] in group_of})
+        if grouped:
+            hint = [g for g in grouped if g in CLINICAL_QUANTITIES]
+            raise ValueError(
+                f"{patterns} touch encoded feature groups {grouped} whose columns cannot be set independently"
+                + (f"; use {{\"quantity\": \"{hint[0]}\"}} instead" if hint else "")
+            )
+
+        base = np.array([float(base_patient[feature_names[i]]) for i in cols])
+        axes.append({
+            'label': ','.join(patterns),
+            'features': [feature_names[i] for i in cols],
+            'columns': {i: (b + options if mode == 'deltas' else options) for i, b in zip(cols, base)},
+            'mode': mode,
+            'options': options
+        })
+    return axes
+
+
+def expand_grid(base_patient, perturbations, feature_names, max_variants=MAX_VARIANTS):
+    """
+    Build the full variant matrix (cartesian product of all axes)
+
+    Returns:
+        tuple: (variant matrix in raw feature space, option index per axis for every variant, axes)
+    """
+    missing = set(feature_names) - set(base_patient)
+    if missing:
+        raise ValueError(f"Missing required features: {list(missing)}")
+
+    axes = _parse_axes(perturbations, feature_names, base_patient)
+    sizes = [len(axis['options']) for axis in axes]
+    total = int(np.prod(sizes)) if sizes else 1
+    if total > max_variants:
+        raise ValueError(f"Grid expands to {total} variants (limit {max_variants})")
+
+    base = np.array([float(base_patient[name]) for name in feature_names])
+    grid = np.array(list(itertools.product(*[range(size) for size in sizes])), dtype=int).reshape(total, len(axes))
+
+    matrix = np.tile(base, (total, 1))
+    for a, axis in enumerate(axes):
+        for col, values in axis['columns'].items():
+            matrix[:, col] = values[grid[:, a]]
+    return matrix, grid, axes
+
+
+def sensitivity_table(predictor, base_patient, perturbations, threshold=0.4, max_variants=MAX_VARIANTS):
+    """
+    Score a base patient plus every perturbation variant in one batch
+
+    Returns:
+        dict: Base probability, per-variant probabilities/deltas and per-axis marginal means
+    """
+    matrix, grid, axes = expand_grid(base_patient, perturbations, predictor.feature_names, max_variants)
+    base = np.array([[float(base_patient[name]) for name in predictor.feature_names]])
+
+    # Base row rides along in the same model call
+    probabilities = predictor.predict_proba_batch(
+        pd.DataFrame(np.vstack([base, matrix]), columns=predictor.feature_names)
+    )
+    base_probability, variant_probs = float(probabilities[0]), probabilities[1:]
+
+    return {
+        'base_probability': round(base_probability, 4),
+        'base_risk_level': risk_label(base_probability),
+        'threshold': threshold,
+        'axes': [
+            {
+                'features': axis['label'],
+                'matched_features': axis['features'],
+                'mode': axis['mode'],
+                'options': axis['options'].tolist(),
+                **({'base_value': axis['base_value']} if 'base_value' in axis else {}),
+                'mean_probability': [
+                    round(float(variant_probs[grid[:, a] == o].mean()), 4) for o in range(len(axis['options']))
+                ]
+            }
+            for a, axis in enumerate(axes)
+        ],
+        'variants': [
+            {
+                'setting': {axis['label']: float(axis['options'][grid[v, a]]) for a, axis in enumerate(axes)},
+                'probability': round(float(p), 4),
+                'delta': round(float(p) - base_probability, 4),
+                'prediction': int(p >= threshold),
+                'risk_level': risk_label(p)
+            }
+            for v, p in enumerate(variant_probs)
+        ]
+    }
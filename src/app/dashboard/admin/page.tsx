@@ -51,6 +51,7 @@ export default function AdminDashboard() {
   const [predictionResult, setPredictionResult] = useState<PredictionResult | null>(null);
   const [loading, setLoading] = useState(false);
   const [uploadedData, setUploadedData] = useState<unknown[] | null>(null);
+  const [uploadedFile, setUploadedFile] = useState<File | null>(null);
   const router = useRouter();
   const { user } = useAuth();
 
@@ -84,7 +85,11 @@ export default function AdminDashboard() {
         return;
       }
 
-      const result = await localMLService.predictFromCsvData(uploadedData as any[]);
+      // Send the file itself so the backend parses and scores it in row blocks;
+      // the browser-parsed rows are only the preview
+      const result = uploadedFile
+        ? await localMLService.predictFromFile(uploadedFile, uploadedData as any[])
+        : await localMLService.predictFromCsvData(uploadedData as any[]);
       console.log('✅ FINAL RESULT RECEIVED FROM LOCAL ML:', result);
       console.log('   Comparison: Sent', uploadedData.length, 'records, ML returned', result.totalPatients, 'total patients');
       
@@ -462,6 +467,7 @@ export default function AdminDashboard() {
             {/* Enhanced Upload Section */}
             <EnhancedFileUpload
               onFileUpload={handleFileUploadData}
+              onFileSelected={setUploadedFile}
               uploadedData={uploadedData}
               loading={loading}
               onGeneratePrediction={handleGeneratePrediction}
@@ -15,6 +15,7 @@ import { toast } from 'react-hot-toast';
 
 interface FileUploadProps {
   onFileUpload: (data: any[]) => void;
+  onFileSelected?: (file: File) => void;
   uploadedData: any[] | null;
   loading: boolean;
   onGeneratePrediction: () => void;
@@ -28,6 +29,7 @@ interface UploadProgress {
 
 export default function EnhancedFileUpload({ 
   onFileUpload, 
+  onFileSelected,
   uploadedData, 
   loading, 
   onGeneratePrediction 
@@ -56,6 +58,7 @@ export default function EnhancedFileUpload({
       const file = files[0];
       if (isValidFile(file)) {
         setSelectedFile(file);
+        onFileSelected?.(file);
         processFile(file);
       } else {
         toast.error('Please upload a valid Excel (.xlsx, .xls) or CSV file');
@@ -201,6 +204,7 @@ export default function EnhancedFileUpload({
     if (file) {
       if (isValidFile(file)) {
         setSelectedFile(file);
+        onFileSelected?.(file);
         processFile(file);
       } else {
         toast.error('Please upload a valid Excel (.xlsx, .xls) or CSV file');
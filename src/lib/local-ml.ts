@@ -19,6 +19,10 @@ interface MLPrediction {
       result?: string;
     };
   };
+  risk_factors?: {
+    factor: string;
+    contribution: number;
+  }[];
   error?: string;
 }
 
@@ -75,20 +79,20 @@ class LocalMLService {
 
   /**
    * Send raw CSV data to local ML model and get predictions
+   * (explain: also request model risk drivers for Medium/High patients - slower)
    */
-  async predictFromCsvData(patientData: PatientData[]): Promise<AnalysisResult> {
+  async predictFromCsvData(patientData: PatientData[], options: { explain?: boolean } = {}): Promise<AnalysisResult> {
     try {
       console.log('🤖 Sending data to local ML backend:', {
         endpoint: this.predictEndpoint,
         patientCount: patientData.length
       });
 
+      const { body, headers } = await this.encodeBody({ patients: patientData, ...(options.explain ? { explain: true } : {}) });
       const response = await fetch(this.predictEndpoint, {
         method: 'POST',
-        headers: {
-          'Content-Type': 'application/json',
-        },
-        body: JSON.stringify({ patients: patientData }),
+        headers,
+        body,
         signal: AbortSignal.timeout(30000)
       });
 
@@ -113,6 +117,48 @@ class LocalMLService {
     }
   }
 
+  /**
+   * Gzip large JSON bodies with the browser's CompressionStream (plain JSON otherwise)
+   */
+  private async encodeBody(payload: unknown): Promise<{ body: BodyInit; headers: Record<string, string> }> {
+    const json = JSON.stringify(payload);
+    const headers: Record<string, string> = { 'Content-Type': 'application/json' };
+
+    if (json.length < 64 * 1024 || typeof CompressionStream === 'undefined') {
+      return { body: json, headers };
+    }
+
+    const compressed = new Blob([json]).stream().pipeThrough(new CompressionStream('gzip'));
+    return {
+      body: await new Response(compressed).arrayBuffer(),
+      headers: { ...headers, 'Content-Encoding': 'gzip' }
+    };
+  }
+
+  /**
+   * Upload a CSV/Excel file as-is; the backend streams and scores it in row blocks,
+   * so large workbooks are never parsed in the browser. originalData, when the caller
+   * already has a parsed preview, is only used for names and risk-factor hints
+   */
+  async predictFromFile(file: File, originalData: PatientData[] = []): Promise<AnalysisResult> {
+    const formData = new FormData();
+    formData.append('file', file);
+
+    const response = await fetch(this.predictEndpoint, {
+      method: 'POST',
+      body: formData,
+      signal: AbortSignal.timeout(300000)
+    });
+
+    if (!response.ok) {
+      const errorText = await response.text();
+      throw new Error(`Backend returned ${response.status}: ${errorText}`);
+    }
+
+    const mlResults: MLResponse = await response.json();
+    return this.transformMLToFrontendFormat(mlResults, originalData);
+  }
+
   /**
    * Transform ML backend results to match Gemini API format expected by frontend
    */
@@ -184,6 +230,14 @@ class LocalMLService {
   private extractRiskFactors(mlPrediction: MLPrediction, originalPatient: PatientData): string[] {
     const riskFactors: string[] = [];
 
+    // Prefer model-derived drivers computed by the backend in the scoring pass
+    const drivers = (mlPrediction.risk_factors || []).filter(d => d.contribution > 0);
+    if (drivers.length > 0) {
+      return drivers
+        .slice(0, 3)
+        .map(d => `${d.factor.replace(/_/g, ' ')} (+${(d.contribution * 100).toFixed(1)}%)`);
+    }
+
     // Get probability for context
     const prob = mlPrediction.probabilities?.readmitted || 0.0;
 